@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# 대시보드 집계의 물리화(materialized) 저장: data/aggregates.json
+#
+# 기록(체크인·장부·등록) 때마다 O(1)로 갱신하고, 원본 파일 버전이 어긋나면(외부 수정, 압축 등)
+# 전체 재계산합니다. 대시보드는 원본 행 수와 무관하게 이 값만 읽습니다.
+import os, json, threading
+from collections import defaultdict
+from datetime import date, timedelta
+import pandas as pd
+
+OVERDUE_DAYS = 7
+NEVER = ""   # 방문 이력 없음(항상 경보 대상)
+
+_lock = threading.Lock()   # 증분 갱신 + 저장을 한 묶음으로 직렬화
+
+def _norm(sources: dict):
+    # 파일 버전(튜플)·SQLite 세대 번호 등 어떤 형태든 JSON 왕복 후의 모양으로 맞춰 비교
+    return json.loads(json.dumps(sources))
+
+def _day(x) -> str:
+    return str(x)[:10]
+
+class Aggregates:
+    def __init__(self):
+        self.fund_in = 0
+        self.fund_out = 0
+        self.fund_daily = defaultdict(int)     # 날짜 → 금액 합(수입·지출 합산, 기존 차트와 동일)
+        self.visit_daily = defaultdict(int)    # 날짜 → 방문 건수
+        self.visit_total = 0
+        self.fund_total = 0
+        # 위험군 → (최근 방문일 → 인원). 경보 수 = 기준일 이전 버킷 합(날짜 종류 수에 비례, 인원 수와 무관)
+        self.last_visit = defaultdict(lambda: defaultdict(int))
+        self.sources = {}                      # 경로 → 파일 버전(재계산 필요 여부 판단)
+
+    # ---- 조회 ----
+    @property
+    def balance(self): return int(self.fund_in - self.fund_out)
+
+    @property
+    def senior_total(self): return sum(sum(b.values()) for b in self.last_visit.values())
+
+    def overdue_by_tier(self, today: date | None = None, days: int | dict = OVERDUE_DAYS):
+        """위험군 → 경보 대상 수. days 가 dict 면 위험군별 간격(없는 위험군은 OVERDUE_DAYS)."""
+        today = today or date.today()
+        out = {}
+        for tier, b in self.last_visit.items():
+            n_days = days.get(tier, OVERDUE_DAYS) if isinstance(days, dict) else days
+            cutoff = (today - timedelta(days=n_days)).isoformat()
+            out[tier] = sum(n for d, n in b.items() if d == NEVER or d <= cutoff)
+        return out
+
+    def overdue(self, today: date | None = None, days: int | dict = OVERDUE_DAYS):
+        return sum(self.overdue_by_tier(today, days).values())
+
+    # ---- 증분 갱신 ----
+    def on_fund(self, rec: dict):
+        amt = int(pd.to_numeric(rec.get("amount"), errors="coerce") or 0)
+        if rec.get("type") == "in": self.fund_in += amt
+        elif rec.get("type") == "out": self.fund_out += amt
+        self.fund_daily[_day(rec["ts"])] += amt
+        self.fund_total += 1
+
+    def on_visit(self, rec: dict, tier, prev_date, new_date):
+        self.visit_daily[_day(rec["ts"])] += 1
+        self.visit_total += 1
+        self.move_senior(tier, prev_date, new_date)
+
+    def move_senior(self, tier, prev_date, new_date):
+        b = self.last_visit[str(tier)]
+        old = NEVER if pd.isna(prev_date) else _day(prev_date)
+        if b.get(old, 0) > 0:
+            b[old] -= 1
+            if not b[old]: del b[old]
+        b[NEVER if pd.isna(new_date) else _day(new_date)] += 1
+
+    def on_senior_added(self, tier, last_visit=None):
+        b = self.last_visit[str(tier)]
+        b[NEVER if pd.isna(last_visit) else _day(last_visit)] += 1
+
+    # ---- 전체 재계산(벡터화) ----
+    @classmethod
+    def rebuild(cls, seniors: pd.DataFrame, visits: pd.DataFrame, fund: pd.DataFrame):
+        agg = cls()
+        if len(fund):
+            amt = pd.to_numeric(fund["amount"], errors="coerce").fillna(0)
+            agg.fund_in = int(amt[fund["type"] == "in"].sum())
+            agg.fund_out = int(amt[fund["type"] == "out"].sum())
+            day = pd.to_datetime(fund["ts"], errors="coerce").dt.strftime("%Y-%m-%d")
+            agg.fund_daily.update({k: int(v) for k, v in amt.groupby(day).sum().items()})
+        agg.fund_total = len(fund)
+        if len(visits):
+            day = pd.to_datetime(visits["ts"], errors="coerce").dt.strftime("%Y-%m-%d")
+            agg.visit_daily.update({k: int(v) for k, v in day.value_counts().items()})
+        agg.visit_total = len(visits)
+        if len(seniors):
+            last = pd.to_datetime(seniors["last_visit_date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna(NEVER)
+            tier = seniors["risk_tier"].astype(str) if "risk_tier" in seniors else pd.Series("", index=seniors.index)
+            for (t, d), n in pd.crosstab(tier, last).stack().items():
+                if n: agg.last_visit[t][d] = int(n)
+        return agg
+
+    # ---- 저장 ----
+    def to_dict(self):
+        return {"fund_in": self.fund_in, "fund_out": self.fund_out, "fund_total": self.fund_total,
+                "fund_daily": dict(self.fund_daily), "visit_daily": dict(self.visit_daily),
+                "visit_total": self.visit_total,
+                "last_visit": {t: dict(b) for t, b in self.last_visit.items()},
+                "sources": self.sources}
+
+    @classmethod
+    def from_dict(cls, d):
+        agg = cls()
+        agg.fund_in, agg.fund_out = d["fund_in"], d["fund_out"]
+        agg.fund_total, agg.visit_total = d["fund_total"], d["visit_total"]
+        agg.fund_daily.update(d["fund_daily"]); agg.visit_daily.update(d["visit_daily"])
+        for t, b in d["last_visit"].items():
+            agg.last_visit[t].update(b)
+        agg.sources = d["sources"]
+        return agg
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+def load(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return Aggregates.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+
+_current = None
+
+def current(path, sources: dict, rebuild_fn):
+    """저장된 집계를 반환. 원본 파일 버전(sources)이 다르면 rebuild_fn()으로 다시 만들어 저장."""
+    global _current
+    with _lock:
+        agg = _current or load(path)
+        if agg is None or agg.sources != _norm(sources):
+            agg = rebuild_fn()
+            agg.sources = _norm(sources)
+            agg.save(path)
+        _current = agg
+        return agg
+
+def update(path, before: dict, after: dict, fn):
+    """기록 직후 호출: 기록 전 버전(before)이 집계와 일치할 때만 fn(agg)로 증분 갱신 후 after로 표시.
+    어긋나면(다른 기록이 끼어듦 등) 버려서 다음 조회 때 재계산되게 함."""
+    global _current
+    with _lock:
+        agg = _current or load(path)
+        if agg is None or agg.sources != _norm(before):
+            _current = None
+            return
+        fn(agg)
+        agg.sources = _norm(after)
+        agg.save(path)
+        _current = agg
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+# 방문 연체 경보: 다음 방문 기한 순 색인(힙) + 보호자 알림 보관함(outbox)
+#
+# 어르신별 다음 기한 = 최근 방문일 + 위험군별 간격(TIER_DAYS). 주기마다 힙 맨 위에서 기한이 지난
+# 어르신만 꺼내므로 비용은 새로 연체된 인원 수에 비례합니다(명부 전체를 훑지 않음).
+#
+# 체크인·등록은 기록하는 쪽(service.py)이 이벤트 로그에 한 줄(명부 버전 before/after 포함) 남기고,
+# 작업자가 이어 읽어 해당 어르신만 새 기한으로 힙에 다시 넣습니다(이전 항목은 꺼낼 때 버림).
+# 이벤트의 before 가 작업자의 명부 버전과 어긋나면(업로드·외부 수정·이벤트 유실) 명부를 다시 읽어 재구성.
+# 이벤트 로그는 작업자가 만들어 두었을 때만 기록됩니다(작업자가 없으면 기록하는 쪽 비용 없음).
+#
+#   python alerts.py run --interval 60     # 상주 작업자
+#   python alerts.py once                  # 1회(cron 등)
+#   python alerts.py bench --seniors 1000000
+import os, json, time, heapq, argparse
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import storage, backend
+from registry import SeniorRegistry
+
+TIER_DAYS = {"고위험": 3, "주의": 5, "일반": 7}
+DEFAULT_DAYS = 7       # 위험군 미지정·기타
+BATCH = 100            # outbox 한 줄(배치)당 최대 인원
+NEVER = 0              # 방문 이력 없음: 기한 서수 0(항상 연체)
+
+PATH_EVENTS = os.path.join(backend.DATA_DIR, "alerts_events.jsonl")
+PATH_OUTBOX = os.path.join(backend.DATA_DIR, "alerts_outbox.jsonl")
+PATH_STATE  = os.path.join(backend.DATA_DIR, "alerts_state.json")
+EVENTS_MAX  = 8 * 1024 * 1024   # 작업자가 멈춰 로그가 이만큼 쌓이면 기록을 멈춤(재개 시 재구성)
+EVENTS_ROTATE = 1024 * 1024     # 작업자가 다 읽은 로그를 비우는 크기
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+_EPOCH_ORD = date(1970, 1, 1).toordinal()
+
+def _norm(ver):
+    # 파일 버전(튜플)·SQLite 세대 번호를 JSON 왕복 후 모양으로 맞춰 비교
+    return json.loads(json.dumps(ver))
+
+def interval(tier) -> int:
+    return TIER_DAYS.get(str(tier), DEFAULT_DAYS)
+
+def due_of(tier, last) -> int:
+    """다음 방문 기한(날짜 서수). 방문 이력이 없으면 NEVER."""
+    if last is None or pd.isna(last) or last == "":
+        return NEVER
+    return pd.Timestamp(last).date().toordinal() + interval(tier)
+
+def _day(o):
+    return "" if o == NEVER else date.fromordinal(o).isoformat()
+
+def _val(v):
+    # 결측(NaN·NaT·pd.NA) → None: JSON 에 표준 밖 NaN 이 나가지 않게
+    return None if v is None or (pd.api.types.is_scalar(v) and pd.isna(v)) else v
+
+# -------------------- 기한 색인 --------------------
+class DueIndex:
+    """senior_id → 다음 기한. 힙은 (기한, senior_id) 이고, 갱신은 새 항목을 넣기만 함(지연 삭제)."""
+
+    def __init__(self, seniors: pd.DataFrame | None = None):
+        self._heap, self._due = [], {}
+        if seniors is not None and len(seniors):
+            ids = seniors["senior_id"].astype(str).tolist()
+            tier = seniors["risk_tier"].astype(str) if "risk_tier" in seniors else pd.Series("", index=seniors.index)
+            days = tier.map(TIER_DAYS).fillna(DEFAULT_DAYS).to_numpy(np.int64)
+            last = pd.to_datetime(seniors["last_visit_date"], errors="coerce").to_numpy("datetime64[D]")
+            due = np.where(np.isnat(last), NEVER, (last - _EPOCH).astype(np.int64) + _EPOCH_ORD + days)
+            self._due = dict(zip(ids, due.tolist()))
+            self._heap = [(d, s) for s, d in self._due.items()]
+            heapq.heapify(self._heap)   # O(n), 재구성 때 1번
+
+    def __len__(self): return len(self._due)
+
+    def due(self, sid): return self._due.get(str(sid))
+
+    def set(self, sid, due: int):
+        sid = str(sid)
+        if self._due.get(sid) == due:
+            return
+        self._due[sid] = due
+        heapq.heappush(self._heap, (due, sid))
+        if len(self._heap) > 2 * len(self._due) + 1024:
+            self._compact()
+
+    def _compact(self):
+        self._heap = [(d, s) for s, d in self._due.items()]
+        heapq.heapify(self._heap)
+
+    def pop_due(self, today: int):
+        """기한이 today 이하인 (senior_id, 기한)을 힙에서 꺼내 반환(오래된 항목은 버림)."""
+        out = []
+        while self._heap and self._heap[0][0] <= today:
+            d, sid = heapq.heappop(self._heap)
+            if self._due.get(sid) == d:
+                out.append((sid, d))
+        return out
+
+# -------------------- 이벤트 로그(기록하는 쪽) --------------------
+def _emit_event(ev: dict):
+    try:
+        fd = os.open(PATH_EVENTS, os.O_WRONLY | os.O_APPEND)   # 작업자가 없으면(파일 없음) 기록 안 함
+    except FileNotFoundError:
+        return
+    try:
+        if os.fstat(fd).st_size < EVENTS_MAX:
+            os.write(fd, (json.dumps(ev, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+    finally:
+        os.close(fd)
+
+def on_checkin(before, after, sid, tier, day):
+    _emit_event({"op": "checkin", "before": before, "after": after, "sid": str(sid),
+                 "tier": str(tier), "day": str(day)})
+
+def on_senior_added(before, after, rec: dict):
+    _emit_event({"op": "senior", "before": before, "after": after, "rec": {k: _val(v) for k, v in rec.items()}})
+
+# -------------------- 작업자 --------------------
+class AlertEngine:
+    """기한 색인 + 이벤트 로그 이어 읽기 + 연체 인원 배치 기록. 보관함 하나에 작업자 하나."""
+
+    def __init__(self, db, outbox=PATH_OUTBOX, events=PATH_EVENTS, state=PATH_STATE, batch=BATCH):
+        self.db, self.outbox, self.events, self.state, self.batch = db, outbox, events, state, batch
+        self.sent = self._load_state()   # senior_id → 경보를 보낸 기한(같은 기한엔 다시 보내지 않음)
+        self.reg = self.index = self.version = None
+        self._offset, self._stale = 0, 0
+        self.rebuilds = 0
+
+    def _load_state(self):
+        try:
+            with open(self.state, encoding="utf-8") as f:
+                return {k: int(v) for k, v in json.load(f)["sent"].items()}
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _save_state(self):
+        tmp = f"{self.state}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sent": self.sent}, f)
+        os.replace(tmp, self.state)
+
+    def rebuild(self):
+        """명부 전체로 색인 재구성(시작·외부 수정 때만). 이벤트 로그는 지금 끝부터 읽음."""
+        if not os.path.exists(self.events):
+            open(self.events, "a").close()
+        self._offset = os.path.getsize(self.events)
+        self.version = _norm(self.db.version("seniors"))
+        self.reg = SeniorRegistry(self.db.load("seniors"))
+        self.index = DueIndex(self.reg.df)
+        self.sent = {s: d for s, d in self.sent.items() if self.index.due(s) == d}
+        self._stale = 0
+        self.rebuilds += 1
+
+    def _apply(self, ev):
+        if ev["op"] == "checkin":
+            # 명부 사본의 최근 방문일은 고치지 않음(열 복사 O(n)). 경보의 최근 방문일은 기한에서 역산
+            self.index.set(ev["sid"], due_of(ev["tier"], ev["day"]))
+            self.sent.pop(ev["sid"], None)
+        elif ev["op"] == "senior":
+            rec = ev["rec"]
+            self.reg = self.reg.add(storage.apply_schema(pd.DataFrame([rec]), "seniors"))
+            self.index.set(rec["senior_id"], due_of(rec.get("risk_tier"), rec.get("last_visit_date")))
+
+    def sync(self):
+        """이벤트 로그에서 새 줄만 반영. 버전이 어긋나면 재구성."""
+        if self.index is None:
+            return self.rebuild()
+        try:
+            with open(self.events, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return self.rebuild()
+        end = data.rfind(b"\n") + 1   # 쓰는 중인 마지막 줄은 다음 주기에
+        for line in data[:end].splitlines():
+            ev = json.loads(line)
+            if _norm(ev["before"]) != self.version:
+                return self.rebuild()
+            self._apply(ev)
+            self.version = _norm(ev["after"])
+        self._offset += end
+        if self._offset >= EVENTS_ROTATE and end == len(data):
+            # 다 읽은 로그는 비움. 그 사이 끼어든 줄이 사라지면 다음 주기에 버전이 어긋나 재구성됨
+            os.replace(self.events, self.events + ".old")
+            open(self.events, "a").close()
+            self._offset = 0
+        # 기록은 커밋 뒤 이벤트를 남기므로 잠깐 어긋날 수 있음: 두 주기 연속 설명되지 않으면 재구성
+        if _norm(self.db.version("seniors")) != self.version:
+            self._stale += 1
+            if self._stale >= 2:
+                self.rebuild()
+        else:
+            self._stale = 0
+
+    def poll(self, today: date | None = None):
+        """새로 연체된 어르신 목록(dict). 기한 순."""
+        today = today or date.today()
+        out = []
+        for sid, d in self.index.pop_due(today.toordinal()):
+            if self.sent.get(sid) == d:
+                continue
+            row = self.reg.get(sid) or {}
+            tier = _val(row.get("risk_tier"))
+            out.append({"senior_id": sid, "name": _val(row.get("name")), "risk_tier": tier,
+                        "last_visit_date": _day(d and d - interval(tier)), "due": _day(d),
+                        "days_over": None if d == NEVER else today.toordinal() - d,
+                        "caregiver": _val(row.get("caregiver")), "caregiver_phone": _val(row.get("caregiver_phone"))})
+            self.sent[sid] = d
+        return out
+
+    def _write_batches(self, alerts):
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        lines = [json.dumps({"batch": f"{stamp}-{i // self.batch:04d}", "ts": datetime.now().isoformat(),
+                             "n": len(chunk), "alerts": chunk}, ensure_ascii=False, allow_nan=False, default=str)
+                 for i in range(0, len(alerts), self.batch) for chunk in [alerts[i:i + self.batch]]]
+        with open(self.outbox, "a", encoding="utf-8") as f:
+            f.write("".join(l + "\n" for l in lines))
+            f.flush(); os.fsync(f.fileno())
+        return len(lines)
+
+    def tick(self, today: date | None = None):
+        """1주기: 이벤트 반영 → 연체 인원 꺼내기 → 보관함 기록 → 보낸 기록 저장(보관함이 먼저라 최소 1번 전달)."""
+        self.sync()
+        alerts = self.poll(today)
+        if alerts:
+            self._write_batches(alerts)
+            self._save_state()
+        return alerts
+
+    def run(self, interval=60):
+        while True:
+            t0 = time.perf_counter()
+            n = len(self.tick())
+            if n:
+                print(f"{datetime.now():%H:%M:%S} 경보 {n}명 ({(time.perf_counter() - t0) * 1000:.1f}ms)", flush=True)
+            time.sleep(interval)
+
+def recent(path=PATH_OUTBOX, n=50, tail_bytes=256 * 1024):
+    """보관함 끝부분에서 최근 경보 최대 n명(최신 배치 먼저). 대시보드 표시용."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - tail_bytes))
+            data = f.read()
+    except OSError:
+        return []
+    out = []
+    for line in reversed(data.splitlines()[1 if len(data) >= tail_bytes else 0:]):
+        try:
+            out.extend(json.loads(line)["alerts"])
+        except (ValueError, KeyError):
+            continue
+        if len(out) >= n:
+            break
+    return out[:n]
+
+# -------------------- 벤치마크 --------------------
+def bench(seniors=1_000_000, checkins=100_000):
+    """합성 명부로 색인 구성·체크인 갱신·주기 조회 시간 측정."""
+    rng = np.random.default_rng(0)
+    today = date.today()
+    df = pd.DataFrame({"senior_id": [f"S{i:07d}" for i in range(seniors)],
+                       "risk_tier": pd.Categorical(rng.choice(list(TIER_DAYS), seniors, p=[0.1, 0.2, 0.7])),
+                       "last_visit_date": pd.Timestamp(today) - pd.to_timedelta(rng.integers(0, 10, seniors), unit="D")})
+    t0 = time.perf_counter()
+    idx = DueIndex(df)
+    t1 = time.perf_counter()
+    first = idx.pop_due(today.toordinal())
+    t2 = time.perf_counter()
+    sids = rng.integers(0, seniors, checkins)
+    tiers = df["risk_tier"].astype(str).to_numpy()
+    for i in sids.tolist():
+        idx.set(f"S{i:07d}", today.toordinal() + interval(tiers[i]))
+    t3 = time.perf_counter()
+    later = idx.pop_due(today.toordinal() + 1)
+    t4 = time.perf_counter()
+    print(f"seniors={seniors:,} build={(t1 - t0) * 1000:.0f}ms first_poll={len(first):,}명 {(t2 - t1) * 1000:.0f}ms "
+          f"checkin={(t3 - t2) / checkins * 1e6:.1f}us/건 next_day_poll={len(later):,}명 {(t4 - t3) * 1000:.0f}ms "
+          f"heap={len(idx._heap):,}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="방문 연체 경보 작업자")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("run").add_argument("--interval", type=float, default=60)
+    sub.add_parser("once")
+    b = sub.add_parser("bench")
+    b.add_argument("--seniors", type=int, default=1_000_000)
+    b.add_argument("--checkins", type=int, default=100_000)
+    args = ap.parse_args(argv)
+    if args.cmd == "bench":
+        return bench(args.seniors, args.checkins)
+    backend.ensure_files()
+    engine = AlertEngine(backend.get())
+    if args.cmd == "once":
+        print(f"경보 {len(engine.tick())}명 → {engine.outbox}")
+    else:
+        engine.run(args.interval)
+
+if __name__ == "__main__":
+    main()
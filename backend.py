@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+# 저장 백엔드: 앱의 적재/저장 지점 뒤에 놓이는 두 가지 구현
+#
+#   csv    (기본) data/*.csv 스냅샷 + 장부 저널 (storage.py)
+#   sqlite JEJU_STORAGE=sqlite 로 선택. data/jeju.db (WAL), 프로세스당 커넥션 풀,
+#          체크인은 방문 INSERT + 최근 방문일 UPDATE 를 한 트랜잭션으로 처리
+#
+# CSV는 SQLite 사용 시에도 가져오기/내보내기 형식으로 남습니다(python backend.py import|export).
+import os, sys, queue, sqlite3, argparse, threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import storage
+
+DATA_DIR = "data"
+PATH_ROADMAP = os.path.join(DATA_DIR, "actions.csv")
+PATH_SENIORS = os.path.join(DATA_DIR, "seniors.csv")
+PATH_VISITS  = os.path.join(DATA_DIR, "visits.csv")
+PATH_FUND    = os.path.join(DATA_DIR, "fund_ledger.csv")
+PATH_DB      = os.environ.get("JEJU_DB", os.path.join(DATA_DIR, "jeju.db"))
+
+PATHS = {"actions": PATH_ROADMAP, "seniors": PATH_SENIORS, "visits": PATH_VISITS, "fund": PATH_FUND}
+LEDGERS = ("visits", "fund")   # 추가 전용으로 기록되는 장부
+
+SAMPLE_ACTIONS = [
+    {"phase":"단기(1~6개월)","task":"제주어 병기 메뉴판/영수증 적용","owner":"매장","cost_krw":50000,"due":"2025-10-01","status":"진행중","segment":"도민","impact_score":3},
+    {"phase":"단기(1~6개월)","task":"도민 전용 주소인증 할인 시범","owner":"매장","cost_krw":0,"due":"2025-10-15","status":"계획","segment":"도민","impact_score":4},
+    {"phase":"중기(6~12개월)","task":"생활 구독(커피+빵) 출시","owner":"연합","cost_krw":200000,"due":"2026-02-01","status":"계획","segment":"도민","impact_score":5},
+    {"phase":"중기(6~12개월)","task":"원데이 체험 클래스(향토/공예)","owner":"협업","cost_krw":150000,"due":"2026-03-01","status":"계획","segment":"관광객","impact_score":4},
+]
+
+def _ensure_dir(): os.makedirs(DATA_DIR, exist_ok=True)
+
+def ensure_files():
+    _ensure_dir()
+    if not os.path.exists(PATH_ROADMAP):
+        pd.DataFrame(SAMPLE_ACTIONS).to_csv(PATH_ROADMAP, index=False)
+    for name in ("seniors", "visits", "fund"):
+        if not os.path.exists(PATHS[name]):
+            pd.DataFrame(columns=list(storage.SCHEMAS[name])).to_csv(PATHS[name], index=False)
+
+def _to_rows(df: pd.DataFrame, name: str):
+    # 스키마 형식 → 저장용 파이썬 값(날짜는 ISO 문자열, 결측은 None)
+    out = df.copy()
+    for col, kind in storage.SCHEMAS[name].items():
+        if col not in out:
+            out[col] = None
+        elif kind == "date" and pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].dt.strftime("%Y-%m-%d")
+        elif kind == "datetime" and pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].map(lambda t: None if pd.isna(t) else t.isoformat())
+    out = out[list(storage.SCHEMAS[name])].astype(object)
+    return out.where(out.notna(), None).itertuples(index=False, name=None)
+
+def _rec_row(rec: dict, name: str):
+    # 1건 기록용 빠른 경로(DataFrame을 만들지 않음). 빈 문자열은 결측으로 취급
+    row = []
+    for col, kind in storage.SCHEMAS[name].items():
+        v = rec.get(col)
+        if v is None or (isinstance(v, float) and v != v) or v is pd.NaT or v == "":
+            row.append(None)
+        elif kind == "int":
+            row.append(int(float(v)))
+        elif kind == "float":
+            row.append(float(v))
+        elif kind == "date":
+            row.append(v.isoformat()[:10] if hasattr(v, "isoformat") else str(v)[:10])
+        elif kind == "datetime":
+            row.append(v.isoformat() if hasattr(v, "isoformat") else str(v))
+        else:
+            row.append(str(v))
+    return tuple(row)
+
+def _typed(rec: dict, name: str):
+    # 1건 → 스키마 적용 1행 DataFrame (빈 문자열은 저장 후 다시 읽은 값과 같도록 결측으로)
+    return storage.apply_schema(pd.DataFrame([{k: (None if v == "" else v) for k, v in rec.items()}]), name)
+
+def _append(rows):
+    return lambda cur: storage.concat_rows(cur, rows)
+
+def _append_rec(rec: dict, name: str):
+    # 1건 기록용: 1행 스키마 적용(수 ms)은 캐시본이 있어 실제로 반영할 때만
+    return lambda cur: storage.concat_rows(cur, _typed(rec, name))
+
+def _replace(df):
+    return lambda cur: df
+
+def _touch(sid, day):
+    # 최근 방문일 1칸만 바꾼 새 DataFrame (copy-on-write: 그 열만 복사)
+    def fn(cur):
+        out = cur.copy(deep=False)
+        pos = (out["senior_id"].astype(str) == str(sid)).to_numpy().nonzero()[0]
+        out.iloc[pos, out.columns.get_loc("last_visit_date")] = pd.Timestamp(day).normalize()
+        return out
+    return fn
+
+# -------------------- CSV --------------------
+# 기록 후에는 데이터셋 캐시(프로세스 공유본)를 다시 읽지 않고 방금 기록한 내용만 반영(storage.cache.advance).
+# 전후 파일 버전 비교가 정확하도록 프로세스 안의 기록은 직렬화합니다(write_lock).
+# 읽고-고쳐-통째로 쓰는 기록(업로드 병합, 명부 저장)도 같은 잠금 안에서 읽으므로, 그 사이의 append·체크인을 덮어쓰지 않음.
+class CsvBackend:
+    kind = "csv"
+
+    def __init__(self):
+        self.write_lock = threading.RLock()   # service 도 색인 갱신 → 기록을 이 잠금으로 묶음
+
+    def version(self, name): return storage.file_version(PATHS[name])
+    def versions(self): return {n: self.version(n) for n in ("seniors", "visits", "fund")}
+
+    def _read(self, path):
+        name = next(n for n, p in PATHS.items() if p == path)
+        if name in LEDGERS: return storage.load_ledger(path, name)
+        return storage.load_snapshot(path, name)
+
+    def load(self, name):
+        ensure_files()
+        return storage.cache.get(PATHS[name], self._read)
+
+    def _write(self, changes: dict, body):
+        # changes: 데이터셋 → fn(캐시본) → 기록 후 DataFrame
+        with self.write_lock:
+            before = {n: self.version(n) for n in changes}
+            body()
+            for n, fn in changes.items():
+                storage.cache.advance(PATHS[n], before[n], self.version(n), fn)
+
+    def _save(self, name, df):
+        path = PATHS[name]
+        if name in LEDGERS: storage.replace_ledger(path, df)
+        else: storage.write_csv(path, df)
+
+    def _journal(self, name, write):
+        write(PATHS[name])
+        storage.maybe_compact(PATHS[name])
+
+    def save(self, name, df):
+        self._write({name: _replace(df)}, lambda: self._save(name, df))
+
+    def append(self, name, rec: dict):
+        # 장부는 전체 재기록 대신 저널에 1행 append (필요 시 백그라운드 압축)
+        self._write({name: _append_rec(rec, name)},
+                    lambda: self._journal(name, lambda p: storage.append_record(p, rec)))
+
+    def append_rows(self, name, df: pd.DataFrame):
+        # 업로드 병합용: 장부는 저널에 한 번에, 명부·로드맵은 파일 재작성
+        if name not in LEDGERS:
+            with self.write_lock:
+                return self.save(name, storage.concat_rows(self.load(name), df))
+        self._write({name: _append(df)}, lambda: self._journal(name, lambda p: storage.append_frame(p, df)))
+
+    def update_rows(self, name, df: pd.DataFrame, keys):
+        """keys 가 같은 기존 행에 df 의 열만 제자리 반영(df 에 없는 열은 저장된 값 유지).
+        없는 키는 끝에 추가. 읽기부터 교체까지 write_lock 안에서(그 사이 append 가 사라지지 않게)."""
+        with self.write_lock:
+            self._update_rows(name, df, keys)
+
+    def _update_rows(self, name, df, keys):
+        cur = self.load(name)
+        pos = pd.Series(np.arange(len(cur)), index=storage.row_hash(cur, keys))
+        pos = pos[~pos.index.duplicated(keep="last")].reindex(storage.row_hash(df, keys)).to_numpy()
+        hit = ~np.isnan(pos)
+        at = pos[hit].astype(int)
+        fresh = df[hit].reset_index(drop=True)
+        old = cur.iloc[at].reset_index(drop=True)
+        rows = storage.concat_rows(old.assign(**{c: fresh[c] for c in df.columns if c in cur}), df[~hit])
+        take = np.arange(len(cur))
+        take[at] = len(cur) + np.arange(len(at))
+        take = np.concatenate([take, len(cur) + len(at) + np.arange(int((~hit).sum()))])
+        merged = storage.concat_rows(cur, rows).iloc[take]
+        self.save(name, storage.apply_schema(merged.reset_index(drop=True), name))
+
+    def add_senior(self, rec: dict, roster: pd.DataFrame):
+        self.save("seniors", roster)
+
+    def checkin(self, visit: dict, sid, day, roster: pd.DataFrame):
+        # CSV는 명부 파일을 통째로 다시 씀(roster 는 이미 갱신된 명부)
+        def body():
+            self._journal("visits", lambda p: storage.append_record(p, visit))
+            self._save("seniors", roster)
+        self._write({"visits": _append_rec(visit, "visits"), "seniors": _replace(roster)}, body)
+
+# -------------------- SQLite (WAL) --------------------
+_SQL_TYPES = {"int": "INTEGER", "float": "REAL"}
+_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_seniors_name ON seniors(name)",
+    "CREATE INDEX IF NOT EXISTS ix_seniors_due ON seniors(risk_tier, last_visit_date)",
+    "CREATE INDEX IF NOT EXISTS ix_visits_sid_ts ON visits(senior_id, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_visits_ts ON visits(ts)",
+    "CREATE INDEX IF NOT EXISTS ix_fund_ts ON fund(ts)",
+    "CREATE INDEX IF NOT EXISTS ix_actions_phase_due ON actions(phase, due)",
+]
+
+def _ddl(name):
+    cols = []
+    for col, kind in storage.SCHEMAS[name].items():
+        decl = f"{col} {_SQL_TYPES.get(kind, 'TEXT')}"
+        if name == "seniors" and col == "senior_id":
+            decl += " PRIMARY KEY"
+        cols.append(decl)
+    return f"CREATE TABLE IF NOT EXISTS {name} ({', '.join(cols)})"
+
+def _csv_frames(src_dir, only_existing=False):
+    # src_dir 의 CSV(장부는 저널 포함)를 (데이터셋, DataFrame)으로. only_existing 이면 빈 파일은 건너뜀
+    for name, path in PATHS.items():
+        path = os.path.join(src_dir, os.path.basename(path))
+        if not os.path.exists(path):
+            continue
+        df = storage.load_ledger(path, name) if name in LEDGERS else storage.read_csv_typed(path, name)
+        if only_existing and not len(df):
+            continue
+        yield name, df
+
+class SqliteBackend:
+    kind = "sqlite"
+
+    def __init__(self, path=PATH_DB, pool_size=8, import_on_empty=True):
+        self.path, self.pool_size, self.import_on_empty = path, pool_size, import_on_empty
+        self._pool, self._pid = queue.LifoQueue(), os.getpid()
+        self._init_lock = threading.Lock()
+        self.write_lock = threading.RLock()   # 트랜잭션이 DB 를 지키고, 이 잠금은 service 의 색인 갱신 → 기록 묶음용
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        if os.getpid() != self._pid:   # fork 이후에는 부모의 커넥션을 쓰지 않음
+            self._pool, self._pid = queue.LifoQueue(), os.getpid()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._pool.qsize() < self.pool_size: self._pool.put(conn)
+            else: conn.close()
+
+    @contextmanager
+    def transaction(self):
+        # 쓰기 트랜잭션은 처음부터 쓰기 잠금(IMMEDIATE)을 잡아 교착/업그레이드 실패를 피함
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def init(self):
+        """테이블·색인·세대 번호 트리거 생성. DB가 비어 있고 CSV가 있으면 한 번 가져옴(import_on_empty).
+
+        비었는지 확인과 가져오기를 같은 IMMEDIATE 트랜잭션에서 하므로, 여러 프로세스가 동시에 시작해도
+        가져오기는 한 번뿐이고 먼저 시작한 프로세스가 기록한 체크인을 덮어쓰지 않음."""
+        with self._init_lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self.transaction() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS dataset_version (name TEXT PRIMARY KEY, gen INTEGER NOT NULL)")
+                for name in storage.SCHEMAS:
+                    conn.execute(_ddl(name))
+                    conn.execute("INSERT OR IGNORE INTO dataset_version VALUES (?, 0)", (name,))
+                    for ev in ("INSERT", "UPDATE", "DELETE"):
+                        conn.execute(f"CREATE TRIGGER IF NOT EXISTS gen_{name}_{ev.lower()} AFTER {ev} ON {name} "
+                                     f"BEGIN UPDATE dataset_version SET gen = gen + 1 WHERE name = '{name}'; END")
+                for ddl in _INDEXES:
+                    conn.execute(ddl)
+                empty = all(conn.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {n})").fetchone()[0] for n in storage.SCHEMAS)
+                if empty and self.import_on_empty:
+                    for name, df in _csv_frames(DATA_DIR, only_existing=True):
+                        self._insert(conn, name, _to_rows(df, name))
+                        storage.cache.invalidate(f"sqlite:{name}")
+            self._ready = True
+
+    def version(self, name):
+        self.init()
+        with self.connection() as conn:
+            return conn.execute("SELECT gen FROM dataset_version WHERE name = ?", (name,)).fetchone()[0]
+
+    def versions(self): return {n: self.version(n) for n in ("seniors", "visits", "fund")}
+
+    def _read(self, name):
+        cols = ", ".join(storage.SCHEMAS[name])
+        with self.connection() as conn:
+            df = pd.read_sql_query(f"SELECT {cols} FROM {name} ORDER BY rowid", conn)
+        return storage.apply_schema(df, name)
+
+    def load(self, name):
+        return storage.cache.get(f"sqlite:{name}", lambda _: self._read(name), version=lambda: self.version(name))
+
+    def _insert(self, conn, name, rows):
+        cols = list(storage.SCHEMAS[name])
+        verb = "INSERT OR REPLACE" if name == "seniors" else "INSERT"
+        conn.executemany(f"{verb} INTO {name} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", rows)
+
+    def _write(self, changes: dict, body):
+        """body(conn) 를 한 트랜잭션으로 실행. IMMEDIATE 잠금 안에서 읽은 전후 세대 번호는 이 트랜잭션의
+        변화뿐이므로, 커밋 후 changes[데이터셋](캐시본) 로 공유본을 재적재 없이 갱신."""
+        self.init()
+        gen = lambda conn, n: conn.execute("SELECT gen FROM dataset_version WHERE name = ?", (n,)).fetchone()[0]
+        with self.transaction() as conn:
+            before = {n: gen(conn, n) for n in changes}
+            body(conn)
+            after = {n: gen(conn, n) for n in changes}
+        for n, fn in changes.items():
+            storage.cache.advance(f"sqlite:{n}", before[n], after[n], fn)
+
+    def save(self, name, df):
+        def body(conn):
+            conn.execute(f"DELETE FROM {name}")
+            self._insert(conn, name, _to_rows(df, name))
+        self._write({name: _replace(df)}, body)
+
+    def append(self, name, rec: dict):
+        self._write({name: _append_rec(rec, name)},
+                    lambda conn: self._insert(conn, name, [_rec_row(rec, name)]))
+
+    def append_rows(self, name, df: pd.DataFrame):
+        self._write({name: _append(df)}, lambda conn: self._insert(conn, name, _to_rows(df, name)))
+
+    def update_rows(self, name, df: pd.DataFrame, keys):
+        """keys 가 같은 기존 행을 rowid 로 찾아 df 에 있는 열만 제자리 UPDATE(없는 키는 INSERT).
+        한 트랜잭션."""
+        self.init()
+        cols = list(storage.SCHEMAS[name])
+        given = [i for i, c in enumerate(cols) if c in df.columns]
+        with self.transaction() as conn:
+            cur = storage.apply_schema(pd.read_sql_query(
+                f"SELECT rowid AS _rid, {', '.join(keys)} FROM {name}", conn), name)
+            rid = pd.Series(cur["_rid"].to_numpy(), index=storage.row_hash(cur, keys))
+            rid = rid[~rid.index.duplicated(keep="last")].reindex(storage.row_hash(df, keys)).to_numpy()
+            rows = list(_to_rows(df, name))
+            conn.executemany(f"UPDATE {name} SET {', '.join(cols[j] + ' = ?' for j in given)} WHERE rowid = ?",
+                             [(*(r[j] for j in given), int(i)) for r, i in zip(rows, rid) if i == i])
+            self._insert(conn, name, [r for r, i in zip(rows, rid) if i != i])
+        storage.cache.invalidate(f"sqlite:{name}")
+
+    def add_senior(self, rec: dict, roster=None):
+        cols = list(storage.SCHEMAS["seniors"])
+        self._write({"seniors": _append_rec(rec, "seniors")}, lambda conn: conn.execute(
+            f"INSERT INTO seniors ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", _rec_row(rec, "seniors")))
+
+    def checkin(self, visit: dict, sid, day, roster=None):
+        """방문 기록 + 최근 방문일 갱신을 한 트랜잭션으로."""
+        def body(conn):
+            self._insert(conn, "visits", [_rec_row(visit, "visits")])
+            conn.execute("UPDATE seniors SET last_visit_date = ? WHERE senior_id = ?",
+                         (pd.Timestamp(day).strftime("%Y-%m-%d"), str(sid)))
+        self._write({"visits": _append_rec(visit, "visits"), "seniors": _touch(sid, day)}, body)
+
+    # ---- CSV 가져오기/내보내기 ----
+    def import_csv(self, src_dir, only_existing=False):
+        for name, df in _csv_frames(src_dir, only_existing):
+            self.save(name, df)
+
+    def export_csv(self, dst_dir):
+        os.makedirs(dst_dir, exist_ok=True)
+        for name, path in PATHS.items():
+            self._read(name).to_csv(os.path.join(dst_dir, os.path.basename(path)), index=False)
+
+_backend = None
+
+def get():
+    """JEJU_STORAGE 환경변수(csv|sqlite)에 따른 프로세스 전역 백엔드."""
+    global _backend
+    if _backend is None:
+        _backend = SqliteBackend() if os.environ.get("JEJU_STORAGE", "csv") == "sqlite" else CsvBackend()
+    return _backend
+
+def local():
+    """현재 폴더의 data/ 에 고정한 백엔드(JEJU_DB 무시). 벤치마크·임시 데이터가 실제 DB 를 건드리지 않게."""
+    if os.environ.get("JEJU_STORAGE", "csv") == "sqlite":
+        return SqliteBackend(os.path.abspath(os.path.join(DATA_DIR, "jeju.db")))
+    return CsvBackend()
+
+def use(db):
+    """프로세스 전역 백엔드를 db 로 교체(이후 get() 은 db). 반환: db."""
+    global _backend
+    _backend = db
+    return db
+
+# -------------------- CLI: 가져오기/내보내기/동시성 점검 --------------------
+def _stress_loop(db, sid, wid, n):
+    for i in range(n):
+        db.checkin({"ts": pd.Timestamp.now().isoformat(), "senior_id": sid, "name": "부하",
+                    "store": f"w{wid}", "notes": str(i)}, sid, pd.Timestamp.today())
+        db.append("fund", {"ts": pd.Timestamp.now().isoformat(), "type": "in", "amount": 1,
+                           "store": f"w{wid}", "memo": str(i)})
+    return n
+
+def _stress_proc(args):
+    from concurrent.futures import ThreadPoolExecutor
+    db_path, sid, proc, threads, n = args
+    db = SqliteBackend(db_path, import_on_empty=False)   # 프로세스마다 자기 커넥션 풀, 스레드끼리는 풀 공유
+    with ThreadPoolExecutor(threads) as tp:
+        return sum(tp.map(lambda t: _stress_loop(db, sid, f"{proc}.{t}", n), range(threads)))
+
+def stress(db_path, procs=4, threads=4, n=200):
+    """여러 프로세스 × 스레드가 동시에 체크인·장부 기록 → 누락 없이 procs*threads*n 건인지 확인."""
+    from concurrent.futures import ProcessPoolExecutor
+    if os.path.exists(db_path):
+        raise SystemExit(f"이미 있는 DB에는 실행하지 않습니다: {db_path}")
+    db = SqliteBackend(db_path, import_on_empty=False)   # 작업 폴더의 data/*.csv 가 섞이면 건수 검사가 틀어짐
+    db.init()
+    db.add_senior({"senior_id": "S_STRESS", "name": "부하", "risk_tier": "일반", "pin": "0000"})
+    with ProcessPoolExecutor(procs) as pp:
+        done = sum(pp.map(_stress_proc, [(db_path, "S_STRESS", p, threads, n) for p in range(procs)]))
+    expected = procs * threads * n
+    got_v, got_f = len(db._read("visits")), len(db._read("fund"))
+    print(f"expected={expected} visits={got_v} fund={got_f} written={done}")
+    return got_v == expected and got_f == expected
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="SQLite 저장소 관리")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("import").add_argument("src", nargs="?", default=DATA_DIR)
+    sub.add_parser("export").add_argument("dst")
+    s = sub.add_parser("stress")
+    s.add_argument("--db", default=os.path.join(DATA_DIR, "stress.db"))
+    s.add_argument("--procs", type=int, default=4)
+    s.add_argument("--threads", type=int, default=4)
+    s.add_argument("-n", type=int, default=200)
+    args = ap.parse_args(argv)
+    if args.cmd == "import":
+        SqliteBackend(import_on_empty=False).import_csv(args.src)
+    elif args.cmd == "export":
+        SqliteBackend(import_on_empty=False).export_csv(args.dst)
+    else:
+        ok = stress(args.db, args.procs, args.threads, args.n)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# 합성 데이터 생성 + 핵심 경로 벤치마크(Streamlit AppTest, 오프라인)
+#
+#   python bench.py gen --dir bench_data --seniors 100000 --visits 10000000
+#   python bench.py run --dir bench_data --out bench_results.json --repeat 5
+#   python bench.py compare old.json new.json        # p50 이 10% 넘게 느려진 항목 표시(있으면 종료 코드 1)
+#
+# 데이터는 <dir>/data/*.csv 에 쓰고, 측정은 <dir> 에서 실행합니다(앱과 같은 data/ 상대 경로).
+# JEJU_STORAGE=sqlite 면 첫 적재 때 CSV 를 <dir>/data/jeju.db 로 가져온 뒤 측정합니다(JEJU_DB 는 무시).
+# 측정 중 체크인을 실제로 기록하므로(방문 몇 건), 데이터는 벤치마크 전용 디렉터리에 만드세요.
+# gen 은 새(또는 빈) 디렉터리나 gen 이 만든 디렉터리(표시 파일 .bench_data)에만 쓰고, run 도 그런 곳에서만 측정합니다.
+import os, sys, json, time, argparse, platform, subprocess, tempfile
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import perf
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+CHUNK = 1_000_000   # 방문·장부를 이 행 수씩 나눠 생성·기록(메모리 상한)
+MARKER = ".bench_data"   # gen 이 만든 디렉터리 표시(실제 data/ 를 지우거나 건드리지 않게)
+
+SURNAMES = ["김", "이", "박", "고", "양", "부", "강", "현", "오", "문", "한", "송", "홍", "좌", "진"]
+AREAS = ["제주시 일도동", "제주시 노형동", "제주시 구좌읍", "제주시 조천읍", "제주시 애월읍", "제주시 한림읍",
+         "제주시 한경면", "제주시 우도면", "서귀포시 대정읍", "서귀포시 남원읍", "서귀포시 성산읍",
+         "서귀포시 안덕면", "서귀포시 표선면", "서귀포시 중문동"]
+STORES = ["혼저커피", "돌하르방빵집", "올레국수", "성산식당", "애월베이커리", "모슬포수산"]
+NOTES = ["", "", "", "컨디션 보통", "쿠폰 사용", "혈압약 복용", "식사 잘 함", "무릎 통증", "보호자 동행"]
+TIERS, TIER_P = ["일반", "주의", "고위험"], [0.7, 0.2, 0.1]
+PHASES = ["단기(1~6개월)", "중기(6~12개월)", "장기(1~3년)"]
+TASKS = ["제주어 병기 메뉴판", "도민 주소인증 할인", "생활 구독(커피+빵)", "원데이 체험 클래스", "어르신 무료 식사",
+         "관광객 체험 패키지", "지역 농산물 메뉴", "돌봄 방문 연계"]
+
+# -------------------- 생성 --------------------
+def _bench_dir(d, create=False):
+    # 벤치마크 전용 디렉터리인지 확인. create 면 새·빈 디렉터리를 만들고 표시 파일을 남김
+    if os.path.exists(os.path.join(d, MARKER)):
+        return
+    if not create or (os.path.exists(d) and os.listdir(d)):
+        raise SystemExit(f"{d}: 벤치마크 전용 디렉터리가 아닙니다({MARKER} 없음). "
+                         "새 디렉터리를 지정하세요(gen 은 이 디렉터리의 data/ 를 비웁니다)")
+    os.makedirs(d, exist_ok=True)
+    open(os.path.join(d, MARKER), "w").close()
+
+def _phones(rng, n):
+    return pd.Series(rng.integers(0, 10**8, n)).map(lambda x: f"010-{x // 10**4:04d}-{x % 10**4:04d}")
+
+def _write(df, path, first):
+    df.to_csv(path, mode="w" if first else "a", header=first, index=False)
+
+def _iso(t0, t1, n, rng):
+    """[t0, t1) ns 구간의 정렬된 시각 n개를 ISO 문자열로(to_csv 의 strftime 보다 훨씬 빠름)."""
+    return np.datetime_as_string(np.sort(rng.integers(t0, t1, n)).astype("datetime64[ns]"), unit="s")
+
+def gen(out_dir, seniors=100_000, visits=1_000_000, fund=100_000, actions=2_000, days=365, seed=0):
+    """<out_dir>/data/ 에 명부·방문기록·기금 장부·로드맵 CSV 생성. 반환: 데이터셋별 행 수.
+    out_dir 은 없거나 비었거나 gen 이 만든 곳이어야 함(아니면 SystemExit)."""
+    _bench_dir(out_dir, create=True)
+    rng = np.random.default_rng(seed)
+    data = os.path.join(out_dir, "data")
+    os.makedirs(data, exist_ok=True)
+    for f in os.listdir(data):   # 이전 스냅샷·DB·집계가 새 CSV 와 섞이지 않게
+        if os.path.isfile(os.path.join(data, f)):
+            os.remove(os.path.join(data, f))
+    end = pd.Timestamp(date.today()) + pd.Timedelta(hours=18)
+    start = end - pd.Timedelta(days=days)
+
+    ids = np.array([f"S{i:07d}" for i in range(1, seniors + 1)], dtype=object)
+    names = (pd.Series(rng.choice(SURNAMES, seniors)) + "OO").to_numpy(object)
+    # 방문 빈도는 어르신마다 다르게(감마 분포), 3%는 방문 이력 없음
+    weight = rng.gamma(0.8, size=seniors) * (rng.random(seniors) >= 0.03)
+    weight /= weight.sum()
+    base_sys, base_wt = rng.normal(128, 12, seniors), rng.normal(60, 9, seniors).clip(35, 110)
+    last = np.full(seniors, -1, dtype=np.int64)   # 최근 방문(기간 시작 기준 일수)
+
+    # 방문기록: 덩어리마다 이어지는 시간 구간 → 파일 전체가 시간순(실제 장부처럼 추가 순서)
+    path = os.path.join(data, "visits.csv")
+    span = (end - start).value
+    _write(pd.DataFrame(columns=["ts", "senior_id", "name", "store", "systolic", "diastolic", "weight_kg", "notes"]), path, True)
+    for lo in range(0, visits, CHUNK):
+        n = min(CHUNK, visits - lo)
+        t0, t1 = start.value + span * lo // visits, start.value + span * (lo + n) // visits
+        ts = _iso(t0, t1, n, rng)
+        who = rng.choice(seniors, n, p=weight)
+        np.maximum.at(last, who, (ts.astype("datetime64[D]") - start.to_datetime64().astype("datetime64[D]")).astype(np.int64))
+        sys_ = (base_sys[who] + rng.normal(0, 8, n)).round()
+        miss = rng.random(n) < 0.2   # 혈압·체중 미측정 방문
+        df = pd.DataFrame({"ts": ts, "senior_id": ids[who], "name": names[who], "store": rng.choice(STORES, n),
+                           "systolic": np.where(miss, np.nan, sys_),
+                           "diastolic": np.where(miss, np.nan, (sys_ * 0.62 + rng.normal(0, 5, n)).round()),
+                           "weight_kg": np.where(miss, np.nan, (base_wt[who] + rng.normal(0, 0.7, n)).round(1)),
+                           "notes": rng.choice(NOTES, n)})
+        _write(df, path, False)
+
+    last_day = pd.Series(start.normalize() + pd.to_timedelta(last, unit="D")).dt.strftime("%Y-%m-%d")
+    pd.DataFrame({"senior_id": ids, "name": names, "phone": _phones(rng, seniors),
+                  "address": rng.choice(AREAS, seniors), "caregiver": (pd.Series(rng.choice(SURNAMES, seniors)) + "보호자"),
+                  "caregiver_phone": _phones(rng, seniors), "risk_tier": rng.choice(TIERS, seniors, p=TIER_P),
+                  "welfare_points": rng.integers(0, 50, seniors) * 10,
+                  "pin": pd.Series(rng.integers(0, 10**4, seniors)).map("{:04d}".format),
+                  "last_visit_date": last_day.where(last >= 0, "")}).to_csv(os.path.join(data, "seniors.csv"), index=False)
+
+    path = os.path.join(data, "fund_ledger.csv")
+    _write(pd.DataFrame(columns=["ts", "type", "amount", "store", "memo", "donation_rate"]), path, True)
+    for lo in range(0, fund, CHUNK):
+        n = min(CHUNK, fund - lo)
+        t0, t1 = start.value + span * lo // fund, start.value + span * (lo + n) // fund
+        inflow = rng.random(n) < 0.7
+        _write(pd.DataFrame({"ts": _iso(t0, t1, n, rng),
+                             "type": np.where(inflow, "in", "out"),
+                             "amount": np.where(inflow, rng.integers(1, 100, n), rng.integers(5, 50, n)) * 1000,
+                             "store": rng.choice(STORES, n),
+                             "memo": np.where(inflow, "체험 매출 1% 적립", "어르신 식사 지원"),
+                             "donation_rate": inflow.astype(int)}), path, False)
+
+    due = pd.Series(pd.Timestamp(date.today()) + pd.to_timedelta(rng.integers(-90, 3 * 365, actions), unit="D"))
+    pd.DataFrame({"phase": rng.choice(PHASES, actions), "task": [f"{t} #{i}" for i, t in enumerate(rng.choice(TASKS, actions))],
+                  "owner": rng.choice(STORES + ["연합", "협업"], actions), "cost_krw": rng.integers(0, 50, actions) * 10000,
+                  "due": due.dt.strftime("%Y-%m-%d"), "status": rng.choice(["계획", "진행중", "완료", "보류"], actions),
+                  "segment": rng.choice(["도민", "관광객", "연계"], actions),
+                  "impact_score": rng.integers(1, 6, actions)}).to_csv(os.path.join(data, "actions.csv"), index=False)
+    return {"seniors": seniors, "visits": visits, "fund": fund, "actions": actions}
+
+# -------------------- 측정 --------------------
+def _throughput(fn, n):
+    t0 = perf.now()
+    fn()
+    sec = perf.now() - t0
+    return {"n": n, "ops_per_s": round(n / sec), "us_per_op": round(sec / n * 1e6, 2)}
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def _apptest(at, *actions):
+    """위젯 조작(actions: at 를 받는 함수들) 후 재실행. 앱 예외는 측정 실패로 처리."""
+    for act in actions:
+        act(at)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"앱 예외: {at.exception[0].value}")
+    return at
+
+def run(data_dir, out="bench_results.json", repeat=5, checkins=20, coupon_n=200_000, qr_n=10):
+    """data_dir 의 데이터로 핵심 경로를 측정해 out(JSON)에 기록하고 결과 dict 반환."""
+    from streamlit.testing.v1 import AppTest
+    out = os.path.abspath(out)
+    _bench_dir(data_dir)
+    os.chdir(data_dir)
+    import storage, backend, aggregates, service, coupon, qrgen
+    timer, res = perf.RerunStats(), {}
+    db = backend.use(backend.local())   # JEJU_DB 가 실제 DB 를 가리켜도 <dir>/data/jeju.db 로 고정(앱도 같은 백엔드)
+
+    # load_df: 텍스트 파싱(스냅샷 없음) / 캐시만 비움(스냅샷·DB) / 캐시 적중
+    rows = {}
+    for name in ("seniors", "visits", "fund", "actions"):
+        if db.kind == "csv" and name != "actions":
+            sp = storage.snapshot_path(backend.PATHS[name])
+            if os.path.exists(sp):
+                os.remove(sp)
+            storage.cache.invalidate()
+            with timer.timer(f"load_df.{name}.parse"):
+                db.load(name)
+        for _ in range(repeat):
+            storage.cache.invalidate()
+            with timer.timer(f"load_df.{name}.cold"):
+                rows[name] = len(db.load(name))
+        for _ in range(repeat):
+            with timer.timer(f"load_df.{name}.warm"):
+                db.load(name)
+
+    # 앱 전체 실행(AppTest): 캐시가 빈 첫 실행 / 재실행 / 화면별
+    storage.cache.invalidate()
+    at = AppTest.from_file(APP, default_timeout=600)
+    with timer.timer("app.first_run"):
+        _apptest(at)
+    for _ in range(repeat):
+        with timer.timer("app.rerun"):
+            _apptest(at)
+    views = at.radio(key="view").options
+    for v in views:
+        for _ in range(repeat):
+            with timer.timer(f"app.view.{v}"):
+                _apptest(at, lambda a: a.radio(key="view").set_value(v))
+
+    # 로드맵 필터·정렬: 필터를 바꿔 가며 재실행
+    _apptest(at, lambda a: a.radio(key="view").set_value("로드맵"))
+    pick = lambda a, label: next(w for w in a.multiselect if w.label == label)
+    for i in range(repeat):
+        with timer.timer("roadmap.filter_sort"):
+            _apptest(at, lambda a: pick(a, "단계").set_value([PHASES[i % 3]]),
+                     lambda a: pick(a, "상태").set_value(["계획", "진행중"][: 1 + i % 2]))
+        with timer.timer("roadmap.search"):
+            _apptest(at, lambda a: next(w for w in a.text_input if w.label == "검색").set_value(TASKS[i % len(TASKS)][:3]))
+
+    # 대시보드 지표: 화면 재실행 / 원본 버전이 바뀌었을 때의 전체 재계산
+    _apptest(at, lambda a: a.radio(key="view").set_value("기금/대시보드"))
+    for _ in range(repeat):
+        with timer.timer("dashboard.view"):
+            _apptest(at)
+    for _ in range(repeat):
+        with timer.timer("dashboard.rebuild"):
+            aggregates.Aggregates.rebuild(db.load("seniors"), db.load("visits"), db.load("fund"))
+
+    # 체크인 1건: 기록 경로(service) / QR 체크인 화면에서 PIN 입력 후 버튼까지
+    reg = service.senior_registry(db)
+    sids = reg.df["senior_id"].sample(checkins * 2, random_state=0).tolist()
+    for sid in sids[:checkins]:
+        with timer.timer("checkin.write"):
+            service.record_checkin(db, sid, 130.0, 80.0, 60.0, "bench", "bench")
+    for sid in sids[checkins:checkins + repeat]:
+        qr = AppTest.from_file(APP, default_timeout=600)
+        qr.query_params.update({"mode": "checkin", "sid": sid})
+        _apptest(qr)
+        pin = reg.get(sid)["pin"]
+        with timer.timer("checkin.apptest"):
+            _apptest(qr, lambda a: a.text_input(key="qr_pin").set_value(pin),
+                     lambda a: a.button(key="qr_checkin").click())
+        if not qr.success:
+            raise RuntimeError(f"체크인 실패: {sid}")
+
+    # 쿠폰 규칙 검사 처리량(1건씩 / 배치)
+    rule = {"segment": "도민", "days": list(coupon.KOR_DAYS), "time_from": "00:00", "time_to": "23:59",
+            "discount_pct": 15, "min_spend": 5000, "care_fund_rate_pct": 1, "code": "JEJU-BENCH"}
+    now, rng = datetime.now().replace(hour=12), np.random.default_rng(0)
+    amounts = rng.integers(0, 60, coupon_n) * 1000
+    res["coupon.check_rule"] = _throughput(
+        lambda: [coupon.check_coupon_rule(rule, int(a), "도민", now) for a in amounts.tolist()], coupon_n)
+    ts = pd.Series(pd.Timestamp(now)).repeat(coupon_n).to_numpy()
+    res["coupon.evaluate_batch"] = _throughput(
+        lambda: coupon.evaluate_batch(rule, amounts, np.full(coupon_n, "도민", dtype=object), ts), coupon_n)
+
+    # QR PNG: 캐시 없이 생성 / 디스크 캐시 적중
+    urls = [qrgen.checkin_url("https://jeju.example", s) for s in sids[:qr_n]]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for u in urls:
+            with timer.timer("qr_png_bytes.render"):
+                qrgen.qr_png_bytes(u, cache_dir=None)
+            qrgen.qr_png_bytes(u, cache_dir=cache_dir)
+            with timer.timer("qr_png_bytes.cached"):
+                qrgen.qr_png_bytes(u, cache_dir=cache_dir)
+
+    res.update(timer.report())
+    result = {"meta": {"ts": datetime.now().isoformat(timespec="seconds"), "commit": _commit(), "storage": db.kind,
+                       "rows": rows, "repeat": repeat, "python": platform.python_version(), "pandas": pd.__version__,
+                       "streamlit": __import__("streamlit").__version__, "machine": platform.machine()},
+              "results": res, "app_scopes": perf.stats.report()}
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    return result
+
+# -------------------- 비교 --------------------
+def _key_ms(r):
+    return r.get("p50_ms", r.get("us_per_op", 0) / 1000)
+
+def compare(old_path, new_path, threshold=0.10):
+    """두 결과 파일의 항목별 p50(처리량 항목은 건당 시간) 비교. 느려진 항목 수 반환."""
+    old, new = (json.load(open(p, encoding="utf-8"))["results"] for p in (old_path, new_path))
+    worse = 0
+    print(f"{'항목':<40}{'이전(ms)':>12}{'이후(ms)':>12}{'배율':>8}")
+    for k in sorted(set(old) & set(new)):
+        a, b = _key_ms(old[k]), _key_ms(new[k])
+        ratio = 1.0 if max(a, b) < 0.1 else b / max(a, 0.05)   # 0.1ms(기록 단위) 미만은 같다고 봄
+        flag = " ▲" if ratio > 1 + threshold else (" ▼" if ratio < 1 - threshold else "")
+        worse += flag == " ▲"
+        print(f"{k:<40}{a:>12.3f}{b:>12.3f}{ratio:>8.2f}{flag}")
+    for k in sorted(set(old) ^ set(new)):
+        print(f"{k:<40}{'(한쪽에만 있음)':>32}")
+    return worse
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="합성 데이터 생성 · 벤치마크")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    g = sub.add_parser("gen")
+    g.add_argument("--dir", default="bench_data")
+    g.add_argument("--seniors", type=int, default=100_000)
+    g.add_argument("--visits", type=int, default=1_000_000)
+    g.add_argument("--fund", type=int, default=100_000)
+    g.add_argument("--actions", type=int, default=2_000)
+    g.add_argument("--days", type=int, default=365)
+    g.add_argument("--seed", type=int, default=0)
+    r = sub.add_parser("run")
+    r.add_argument("--dir", default="bench_data")
+    r.add_argument("--out", default="bench_results.json")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--checkins", type=int, default=20)
+    c = sub.add_parser("compare")
+    c.add_argument("old")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10)
+    args = ap.parse_args(argv)
+    if args.cmd == "gen":
+        t0 = time.perf_counter()
+        n = gen(args.dir, args.seniors, args.visits, args.fund, args.actions, args.days, args.seed)
+        print(f"{n} → {os.path.join(args.dir, 'data')} ({time.perf_counter() - t0:.1f}s)")
+    elif args.cmd == "run":
+        result = run(args.dir, args.out, args.repeat, args.checkins)
+        for k, v in result["results"].items():
+            print(f"{k:<40}{json.dumps(v, ensure_ascii=False)}")
+        print(f"→ {args.out}")
+    else:
+        sys.exit(1 if compare(args.old, args.new, args.threshold) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# 쿠폰 규칙: 단건 검증(check_coupon_rule) + 컴파일된 규칙의 벡터화 일괄 평가
+#
+# 일괄 평가는 하루치 POS 거래를 여러 후보 규칙에 재생해 보기 위한 것으로,
+# 결과(할인액·기금액·반려 사유와 그 순서)는 check_coupon_rule 과 완전히 같습니다.
+import os, json, hmac, base64, random, string, hashlib, struct, secrets, threading, urllib.parse
+from functools import lru_cache
+from dataclasses import dataclass
+from datetime import datetime
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+
+KOR_DAYS = ["월","화","수","목","금","토","일"]
+
+REJECT_SEGMENT = "세그먼트 불일치"
+REJECT_DAY     = "적용 요일 아님"
+REJECT_TIME    = "적용 시간대 아님"
+REJECT_MIN     = "최소 결제액 미만"
+
+def make_coupon(prefix="JEJU", n=6):
+    return f"{prefix}-" + "".join(random.choices(string.ascii_uppercase+string.digits, k=n))
+
+def _kor_day(dt: datetime):
+    return KOR_DAYS[dt.weekday()]
+
+def check_coupon_rule(rule: dict, cart_amount: int, segment: str | None = None, now: datetime | None = None):
+    now = now or datetime.now()
+    if segment and rule.get("segment") and segment != rule["segment"]:
+        return (False, REJECT_SEGMENT)
+    if _kor_day(now) not in rule["days"]:
+        return (False, REJECT_DAY)
+    cur = now.strftime("%H:%M")
+    if not (rule["time_from"] <= cur <= rule["time_to"]):
+        return (False, REJECT_TIME)
+    if cart_amount < rule["min_spend"]:
+        return (False, REJECT_MIN)
+    discount = int(round(cart_amount * rule["discount_pct"] / 100))
+    care_fund = int(round(cart_amount * rule.get("care_fund_rate_pct", 0) / 100))
+    return (True, {"discount": discount, "care_fund": care_fund})
+
+def verify_url(public_url: str, rule: dict) -> str:
+    # QR 스캔 시 여는 검증 URL (?r=서명된 압축 토큰)
+    return f"{public_url}?r={encode_token(rule)}"
+
+# -------------------- 서명된 쿠폰 토큰 --------------------
+# 규칙을 고정 필드로 묶은 바이너리 + HMAC-SHA256(앞 8바이트) → base32(패딩 제거).
+# URL-인코딩 JSON(한글 1자 = 9바이트) 대비 QR 버전이 크게 낮아지고, 키 없이는 위조할 수 없습니다.
+#
+#   ver u8 | segment u8 | days u8(비트마스크) | from u16 | to u16 | discount_bp u16 | care_bp u16
+#   | min_spend uvarint | code(len u8 + utf-8) | [segment=255: len u8 + utf-8] | hmac 8B
+TOKEN_VERSION = 1
+SIG_BYTES = 8
+SECRET_PATH = os.path.join("data", "coupon_secret.key")
+_SEGMENTS = {None: 0, "도민": 1, "관광객": 2}
+_SEGMENT_NAMES = {v: k for k, v in _SEGMENTS.items()}
+_SEG_OTHER = 255
+# 구형 QR(URL-인코딩 JSON)은 서명이 없어 누구나 만들 수 있으므로 기본 거부. 교체 기간에만 1 로 명시적 허용
+ALLOW_UNSIGNED = os.environ.get("COUPON_ALLOW_UNSIGNED", "") == "1"
+
+class UnsignedCoupon(ValueError):
+    """서명 없는 구형 쿠폰 규칙(허용 설정이 꺼져 있을 때)."""
+
+_keys: dict[str, bytes] = {}   # 키 파일 절대 경로 → 키(서명·검증마다 디스크를 읽지 않게)
+
+def _read_key(path) -> bytes:
+    with open(path, "rb") as f:
+        key = f.read()
+    if not key:
+        raise ValueError(f"쿠폰 서명 키 파일이 비어 있습니다: {path}")
+    return key
+
+def _secret() -> bytes:
+    # COUPON_SECRET 환경변수 우선, 없으면 data/coupon_secret.key 를 한 번 만들어 재사용
+    env = os.environ.get("COUPON_SECRET")
+    if env:
+        return env.encode("utf-8")
+    path = os.path.abspath(SECRET_PATH)
+    key = _keys.get(path)
+    if key is None:
+        try:
+            key = _read_key(path)
+        except FileNotFoundError:
+            # 다 쓴 임시 파일을 link 로 제자리에 둠: 읽는 쪽은 빈 파일을 볼 수 없고, 동시에 만들면 먼저 둔 키를 씀
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_bytes(32))
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp)
+            key = _read_key(path)
+        _keys[path] = key
+    return key
+
+def _sign(payload: bytes, key: bytes) -> bytes:
+    return hmac.new(key, payload, hashlib.sha256).digest()[:SIG_BYTES]
+
+def _uvarint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b, n = n & 0x7F, n >> 7
+        out.append(b | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+def _short_str(s: str) -> bytes:
+    b = s.encode("utf-8")
+    if len(b) > 255:
+        raise ValueError("문자열이 너무 깁니다")
+    return bytes([len(b)]) + b
+
+def encode_token(rule: dict, key: bytes | None = None) -> str:
+    cr = compile_rule(rule)
+    seg = _SEGMENTS.get(cr.segment, _SEG_OTHER)
+    payload = struct.pack(">BBBHHHH", TOKEN_VERSION, seg, cr.day_mask, cr.t_from, cr.t_to, cr.discount_bp, cr.care_bp)
+    payload += _uvarint(int(cr.min_spend)) + _short_str(cr.code or "")
+    if seg == _SEG_OTHER:
+        payload += _short_str(cr.segment)
+    raw = payload + _sign(payload, key or _secret())
+    return base64.b32encode(raw).decode("ascii").rstrip("=")
+
+def _pct(bp: int):
+    return bp // 100 if bp % 100 == 0 else bp / 100
+
+@lru_cache(maxsize=4096)
+def _decode_verified(token: str, key: bytes) -> tuple:
+    try:
+        raw = base64.b32decode(token + "=" * (-len(token) % 8), casefold=True)
+    except Exception:
+        raise ValueError("토큰 형식 오류")
+    payload, sig = raw[:-SIG_BYTES], raw[-SIG_BYTES:]
+    if len(payload) < 11 or not hmac.compare_digest(sig, _sign(payload, key)):
+        raise ValueError("서명 불일치(위조되었거나 다른 매장 키로 발급된 QR)")
+    ver, seg, mask, t_from, t_to, d_bp, c_bp = struct.unpack_from(">BBBHHHH", payload)
+    if ver != TOKEN_VERSION:
+        raise ValueError(f"지원하지 않는 토큰 버전: {ver}")
+    i, shift, min_spend = 11, 0, 0
+    while True:
+        b = payload[i]; i += 1
+        min_spend |= (b & 0x7F) << shift; shift += 7
+        if not b & 0x80:
+            break
+    n = payload[i]; code = payload[i + 1:i + 1 + n].decode("utf-8"); i += 1 + n
+    segment = _SEGMENT_NAMES.get(seg)
+    if seg == _SEG_OTHER:
+        n = payload[i]; segment = payload[i + 1:i + 1 + n].decode("utf-8")
+    rule = {
+        "segment": segment,
+        "days": tuple(d for k, d in enumerate(KOR_DAYS) if mask >> k & 1),
+        "time_from": f"{t_from // 60:02d}:{t_from % 60:02d}",
+        "time_to": f"{t_to // 60:02d}:{t_to % 60:02d}",
+        "discount_pct": _pct(d_bp),
+        "min_spend": min_spend,
+        "care_fund_rate_pct": _pct(c_bp),
+        "code": code,
+    }
+    return tuple(rule.items())
+
+def decode_token(token: str, key: bytes | None = None) -> dict:
+    """서명을 검증하고 규칙 dict를 복원. 검증된 토큰은 캐시되며, 실패 시 ValueError."""
+    rule = dict(_decode_verified(token.strip(), key or _secret()))
+    rule["days"] = list(rule["days"])
+    return rule
+
+def rule_from_param(r: str, allow_unsigned: bool | None = None) -> tuple:
+    """QR 의 ?r= 값 → (규칙 dict, 서명 여부). 구형(URL-인코딩 JSON)은 서명이 없어
+    allow_unsigned(기본 ALLOW_UNSIGNED)일 때만 (규칙, False), 아니면 UnsignedCoupon."""
+    if r.lstrip().startswith(("{", "%7B", "%7b")):
+        if not (ALLOW_UNSIGNED if allow_unsigned is None else allow_unsigned):
+            raise UnsignedCoupon("서명 없는 구형 쿠폰 QR은 받지 않습니다(위조 가능). 새 QR로 교체하세요")
+        return json.loads(urllib.parse.unquote(r)), False
+    return decode_token(r), True
+
+# -------------------- 컴파일된 규칙 --------------------
+@dataclass(frozen=True)
+class CompiledRule:
+    segment: str | None   # None/빈값이면 세그먼트 무관
+    day_mask: int         # bit i = 요일 i (월=0 … 일=6)
+    t_from: int           # 분 단위(0~1439), 양끝 포함
+    t_to: int
+    min_spend: int
+    discount_bp: int      # 베이시스 포인트(1% = 100)
+    care_bp: int
+    code: str = ""
+
+def _minutes(hhmm: str) -> int:
+    # 원본은 "HH:MM" 문자열 비교이므로 0을 채운 형식만 받아야 분 비교와 결과가 같음
+    if len(hhmm) != 5 or hhmm[2] != ":" or not (hhmm[:2] + hhmm[3:]).isdigit():
+        raise ValueError(f"시간 형식은 HH:MM 이어야 합니다: {hhmm!r}")
+    return int(hhmm[:2]) * 60 + int(hhmm[3:])
+
+def _bp(pct) -> int:
+    # 정수 bp 계산이 원본 부동소수 계산과 같은 값을 내려면 pct가 정확히 bp/100 이어야 함
+    bp = round(pct * 100)
+    if Fraction(pct) != Fraction(bp, 100):
+        raise ValueError(f"비율은 0.01% 단위여야 합니다: {pct!r}")
+    return int(bp)
+
+def compile_rule(rule: dict) -> CompiledRule:
+    mask = 0
+    for i, d in enumerate(KOR_DAYS):
+        if d in rule["days"]:
+            mask |= 1 << i
+    return CompiledRule(
+        segment=rule.get("segment") or None,
+        day_mask=mask,
+        t_from=_minutes(rule["time_from"]),
+        t_to=_minutes(rule["time_to"]),
+        min_spend=rule["min_spend"],
+        discount_bp=_bp(rule["discount_pct"]),
+        care_bp=_bp(rule.get("care_fund_rate_pct", 0)),
+        code=rule.get("code", ""),
+    )
+
+def _prepare(amount, segment, ts):
+    amount = np.asarray(amount, dtype=np.int64)
+    ts = pd.DatetimeIndex(pd.to_datetime(ts))
+    day_bit = np.left_shift(1, ts.weekday.to_numpy(dtype=np.int64))
+    minute = ts.hour.to_numpy(dtype=np.int64) * 60 + ts.minute.to_numpy(dtype=np.int64)
+    if segment is None:
+        seg = np.full(len(amount), None, dtype=object)
+    else:
+        seg = np.asarray(segment, dtype=object)
+    seg_given = np.not_equal(seg, None) & np.not_equal(seg, "")   # 원본의 `if segment` 와 같은 판정
+    return amount, seg, seg_given, day_bit, minute
+
+def _evaluate(cr: CompiledRule, amount, seg, seg_given, day_bit, minute):
+    n = len(amount)
+    reason = np.full(n, None, dtype=object)
+    pending = np.ones(n, dtype=bool)
+    checks = []
+    if cr.segment:
+        checks.append((seg_given & (seg != cr.segment), REJECT_SEGMENT))
+    checks += [
+        ((day_bit & cr.day_mask) == 0, REJECT_DAY),
+        ((minute < cr.t_from) | (minute > cr.t_to), REJECT_TIME),
+        (amount < cr.min_spend, REJECT_MIN),
+    ]
+    for fail, msg in checks:   # 원본과 같은 순서로 첫 번째 반려 사유만 기록
+        hit = pending & fail
+        reason[hit] = msg
+        pending &= ~fail
+    # int(round(a * pct / 100)) 와 같은 값: a*bp/10000 은 같은 유리수의 정확 반올림, rint 는 짝수 반올림
+    discount = np.where(pending, np.rint(amount * cr.discount_bp / 10000), 0).astype(np.int64)
+    care_fund = np.where(pending, np.rint(amount * cr.care_bp / 10000), 0).astype(np.int64)
+    return pd.DataFrame({"ok": pending, "discount": discount, "care_fund": care_fund, "reason": reason})
+
+def evaluate_batch(rule, amount, segment, ts) -> pd.DataFrame:
+    """(금액, 세그먼트, 시각) 배열을 규칙 1개로 일괄 평가.
+
+    rule 은 dict 또는 CompiledRule. 반환 열: ok, discount, care_fund, reason(적용 시 None).
+    """
+    cr = rule if isinstance(rule, CompiledRule) else compile_rule(rule)
+    return _evaluate(cr, *_prepare(amount, segment, ts))
+
+def evaluate_rules(rules, amount, segment, ts) -> pd.DataFrame:
+    """여러 규칙에 같은 거래를 재생. 요일·분 계산은 한 번만 하고 rule(순번)·code 열을 붙여 이어 붙임."""
+    prep = _prepare(amount, segment, ts)
+    out = []
+    for i, rule in enumerate(rules):
+        cr = rule if isinstance(rule, CompiledRule) else compile_rule(rule)
+        df = _evaluate(cr, *prep)
+        df.insert(0, "rule", i)
+        df.insert(1, "code", cr.code)
+        out.append(df)
+    return pd.concat(out, ignore_index=True) if out else pd.DataFrame()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# CSV 업로드 적재: 청크 단위로 읽어 스키마 검증 후 저장소에 키 기준 병합(upsert)
+#
+#   seniors  senior_id          actions  phase + task
+#   visits   ts + senior_id     fund     ts + type + amount + store
+#
+# 원본 전체를 메모리에 올리지 않습니다(청크 + 기존 행의 64비트 해시 배열만 유지).
+# 장부의 새 행은 청크마다 바로 저널/테이블에 추가하고, 내용이 바뀐 기존 행은 마지막에
+# 한 번에 제자리 갱신합니다(CSV는 이때만 전체 재작성). 업로드에 없는 열은 저장된 값을 그대로 둡니다.
+# 같은 파일(SHA-256)은 한 번만 반영합니다.
+import os, sys, json, hashlib, argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import storage, backend
+
+KEYS = {
+    "actions": ("phase", "task"),
+    "seniors": ("senior_id",),
+    "visits":  ("ts", "senior_id"),
+    "fund":    ("ts", "type", "amount", "store"),
+}
+CHUNK_ROWS = 50_000
+LOG_PATH = os.path.join(backend.DATA_DIR, "ingested.json")
+_TYPED = ("int", "float", "date", "datetime")
+
+# -------------------- 업로드 기록 --------------------
+def file_digest(src) -> str:
+    """경로 또는 이진 파일 객체의 SHA-256(파일 객체는 처음 위치로 되돌림)."""
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    src.seek(0)
+    h = hashlib.file_digest(src, "sha256").hexdigest()
+    src.seek(0)
+    return h
+
+def _log():
+    try:
+        with open(LOG_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _remember(key, summary):
+    log = _log()
+    log[key] = {**summary, "at": datetime.now().isoformat(timespec="seconds")}
+    tmp = LOG_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(log, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, LOG_PATH)
+
+def log_key(db, name, digest): return f"{db.kind}:{name}:{digest}"
+
+def already_ingested(db, name, digest):
+    """이 저장소·데이터셋에 같은 파일을 반영한 적이 있으면 그때의 요약(dict), 없으면 None."""
+    return _log().get(log_key(db, name, digest))
+
+# -------------------- 검증 · 해시 --------------------
+def validate(raw: pd.DataFrame, name: str):
+    """문자열로 읽은 청크 → (스키마 적용 DataFrame, 반려 행 마스크).
+    키가 비었거나, 값이 있는데 숫자/날짜로 해석되지 않는 행은 반려."""
+    df = storage.apply_schema(raw, name)
+    def given(col):
+        s = raw[col]
+        return (s.notna() & (s.astype(str).str.strip() != "")).to_numpy()
+    bad = np.zeros(len(raw), dtype=bool)
+    for col, kind in storage.SCHEMAS[name].items():
+        if kind in _TYPED:
+            bad |= given(col) & df[col].isna().to_numpy()
+    for col in KEYS[name]:
+        bad |= ~given(col)
+    return df, bad
+
+class _KeyIndex:
+    """키 해시(정렬) → 행 해시. 기존 행과 이번 업로드에서 이미 반영한 행을 함께 추적."""
+    def __init__(self, df, keys, cols):
+        self.keys, self.cols = keys, cols
+        kh = storage.row_hash(df, keys) if len(df) else np.empty(0, np.uint64)
+        rh = storage.row_hash(df, cols) if len(df) else np.empty(0, np.uint64)
+        order = np.argsort(kh, kind="stable")
+        self.k, self.r = kh[order], rh[order]
+
+    def classify(self, df):
+        """청크 행을 (새 키, 바뀐 기존 키) 마스크로 나누고 색인에 반영."""
+        kh, rh = storage.row_hash(df, self.keys), storage.row_hash(df, self.cols)
+        hit = changed = np.zeros(len(kh), dtype=bool)
+        if len(self.k):
+            at = np.minimum(np.searchsorted(self.k, kh), len(self.k) - 1)
+            hit = self.k[at] == kh
+            changed = hit & (self.r[at] != rh)
+            self.r[at[changed]] = rh[changed]
+        new = ~hit
+        if new.any():
+            k, r = np.concatenate([self.k, kh[new]]), np.concatenate([self.r, rh[new]])
+            order = np.argsort(k, kind="stable")
+            self.k, self.r = k[order], r[order]
+        return new, changed
+
+# -------------------- 적재 --------------------
+def ingest(db, name, src, total_bytes=None, progress=None, chunk_rows=CHUNK_ROWS):
+    """src(경로 또는 파일 객체)를 청크로 읽어 name 데이터셋에 병합하고 요약 dict 반환.
+
+    progress(읽은 바이트, 전체 바이트, 처리 행 수) 는 청크마다 호출.
+    """
+    keys, cols = list(KEYS[name]), list(storage.SCHEMAS[name])
+    ledger = name in backend.LEDGERS
+    index = given = None   # 업로드에 있는 스키마 열만 비교·갱신(없는 열은 저장된 값 유지)
+    out = {"dataset": name, "rows": 0, "added": 0, "updated": 0, "unchanged": 0, "rejected": 0,
+           "rejected_lines": []}
+    held, updates = [], []   # 명부·로드맵의 새 행(마지막에 한 번 저장), 바뀐 기존 행
+    f = open(src, "rb") if isinstance(src, (str, os.PathLike)) else src
+    if total_bytes is None and hasattr(f, "seek"):
+        total_bytes = f.seek(0, os.SEEK_END); f.seek(0)
+    try:
+        for raw in pd.read_csv(f, dtype=str, chunksize=chunk_rows):
+            if not out["rows"]:
+                missing = [k for k in keys if k not in raw.columns]
+                if missing:
+                    raise ValueError(f"{name}: 필수 열 없음 {missing}")
+                given = [c for c in cols if c in raw.columns]
+                index = _KeyIndex(db.load(name).reindex(columns=cols), keys, given)
+            line0 = out["rows"] + 2   # 헤더 다음 줄부터 1-based
+            out["rows"] += len(raw)
+            df, bad = validate(raw.reindex(columns=cols), name)
+            if bad.any():
+                out["rejected"] += int(bad.sum())
+                room = 20 - len(out["rejected_lines"])
+                out["rejected_lines"] += [line0 + int(i) for i in np.flatnonzero(bad)[:max(room, 0)]]
+                df = df[~bad]
+            df = df.drop_duplicates(keys, keep="last")
+            new, changed = index.classify(df)
+            out["added"] += int(new.sum()); out["updated"] += int(changed.sum())
+            out["unchanged"] += int(len(df) - new.sum() - changed.sum())
+            if new.any():
+                if ledger: db.append_rows(name, df[new])
+                else: held.append(df[new])
+            if changed.any():
+                updates.append(df.loc[changed, given])
+            if progress:
+                progress(f.tell() if hasattr(f, "tell") else 0, total_bytes, out["rows"])
+    finally:
+        if f is not src:
+            f.close()
+    if held:
+        db.append_rows(name, pd.concat(held, ignore_index=True).drop_duplicates(keys, keep="last"))
+    if updates:
+        db.update_rows(name, pd.concat(updates, ignore_index=True).drop_duplicates(keys, keep="last"), keys)
+    return out
+
+def ingest_once(db, name, src, progress=None, chunk_rows=CHUNK_ROWS):
+    """같은 파일을 이미 반영했으면 건너뜀. (요약 dict, 이번에 반영했는지) 반환."""
+    digest = file_digest(src)
+    prev = already_ingested(db, name, digest)
+    if prev is not None:
+        return prev, False
+    summary = ingest(db, name, src, progress=progress, chunk_rows=chunk_rows)
+    _remember(log_key(db, name, digest), summary)
+    return summary, True
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="CSV를 저장소에 병합(같은 파일은 한 번만)")
+    ap.add_argument("dataset", choices=list(KEYS))
+    ap.add_argument("csv")
+    ap.add_argument("--chunk", type=int, default=CHUNK_ROWS)
+    args = ap.parse_args(argv)
+    backend.ensure_files()
+
+    def show(done, total, rows):
+        print(f"\r{done / max(total or 1, 1):6.1%}  {rows:,}행", end="", file=sys.stderr, flush=True)
+
+    summary, fresh = ingest_once(backend.get(), args.dataset, args.csv, show, args.chunk)
+    print(file=sys.stderr)
+    print(json.dumps({**summary, "skipped": not fresh}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
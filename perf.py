@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# 재실행 시간 · 메모리 측정
+#
+# 재실행: 전체 실행·화면(프래그먼트)별 소요 시간을 프로세스 전역으로 모아 분위수로 보고.
+#   모든 접속 세션의 재실행이 한곳에 쌓이므로 동시 접속이 많을 때의 비용을 그대로 볼 수 있습니다.
+# 메모리: 프로세스 공유 데이터셋(1벌) 대 세션별 상태 크기.
+import sys, time, threading
+from functools import wraps
+from contextlib import contextmanager
+from collections import defaultdict, deque
+import pandas as pd
+
+WINDOW = 500   # 구간별로 보관하는 최근 측정 수
+
+def now(): return time.perf_counter()
+
+class RerunStats:
+    def __init__(self, window=WINDOW):
+        self._lock = threading.Lock()
+        self._ms = defaultdict(lambda: deque(maxlen=window))
+        self._count = defaultdict(int)
+
+    def record(self, scope, ms):
+        with self._lock:
+            self._ms[scope].append(ms)
+            self._count[scope] += 1
+
+    def since(self, scope, t0):
+        self.record(scope, (now() - t0) * 1000)
+
+    @contextmanager
+    def timer(self, scope):
+        t0 = now()
+        try:
+            yield
+        finally:
+            self.since(scope, t0)
+
+    def timed(self, scope):
+        """함수 실행 시간을 scope 로 기록하는 데코레이터(프래그먼트 함수에 그대로 사용)."""
+        def deco(fn):
+            @wraps(fn)
+            def run(*a, **kw):
+                with self.timer(scope):
+                    return fn(*a, **kw)
+            return run
+        return deco
+
+    def report(self):
+        """scope → 누적 횟수와 최근 WINDOW 회의 p50/p95/최대(ms)."""
+        with self._lock:
+            snap = {k: sorted(v) for k, v in self._ms.items()}
+            count = dict(self._count)
+        out = {}
+        for scope, ms in sorted(snap.items()):
+            if not ms:
+                continue
+            q = lambda p: round(ms[min(len(ms) - 1, int(p * len(ms)))], 1)
+            out[scope] = {"n": count[scope], "p50_ms": q(0.5), "p95_ms": q(0.95), "max_ms": round(ms[-1], 1)}
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._ms.clear(); self._count.clear()
+
+stats = RerunStats()
+
+# -------------------- 메모리 --------------------
+def nbytes(obj, shared=frozenset()):
+    """대략 메모리(bytes). shared(id 집합)에 든 공유 객체는 0으로 셈."""
+    if id(obj) in shared:
+        return 0
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(nbytes(k, shared) + nbytes(v, shared) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(nbytes(v, shared) for v in obj)
+    return int(getattr(obj, "nbytes", 0)) or sys.getsizeof(obj)
+
+def _session_states():
+    # 실행 중인 Streamlit 서버의 모든 세션 상태(내부 API라 없으면 None)
+    try:
+        from streamlit.runtime import Runtime
+        return [info.session.session_state.filtered_state
+                for info in Runtime.instance()._session_mgr.list_sessions()]
+    except Exception:
+        return None
+
+def memory_report(state, cache):
+    """공유 데이터셋 크기와, 이 세션·전체 세션의 세션 상태 크기(공유 객체 참조는 제외)."""
+    shared = {id(o) for o in cache.objects()}
+    size = lambda st: sum(nbytes(v, shared) for v in dict(st).values())
+    out = {"공유 데이터셋(프로세스 1벌)": cache.stats()["bytes"], "이 세션": size(state)}
+    states = _session_states()
+    if states:
+        sizes = [size(s) for s in states]
+        out.update({"세션 수": len(sizes), "세션 합계": sum(sizes), "세션 최대": max(sizes)})
+    return out
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+# QR 생성: 단건 PNG(내용 주소 기반 디스크 캐시) + 명부/쿠폰 일괄 생성(프로세스 풀 → ZIP·인쇄용 PDF)
+#
+# segno 가 있으면 segno로, 없으면 아래의 순수 파이썬 인코더(바이트 모드, 오류정정 M)로 그립니다.
+# 어느 쪽이든 네트워크를 쓰지 않습니다.
+import os, io, sys, json, zlib, struct, hashlib, zipfile, argparse, urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+QR_CACHE_DIR = os.path.join("data", "qr_cache")
+POOL_MIN_ITEMS = 32   # 이보다 적으면 풀 기동 비용이 더 큼
+
+# -------------------- 순수 파이썬 QR 인코더 --------------------
+# 버전별 블록당 ECC 코드워드 수 / 블록 수 (오류정정 M, 인덱스 = 버전)
+_ECC_M = (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+          26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28)
+_BLOCKS_M = (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+             17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49)
+_ECL_M_BITS = 0   # 형식 정보의 오류정정 레벨 비트(M)
+
+def _raw_modules(ver):
+    n = (16 * ver + 128) * ver + 64
+    if ver >= 2:
+        na = ver // 7 + 2
+        n -= (25 * na - 10) * na - 55
+        if ver >= 7:
+            n -= 36
+    return n
+
+def _data_codewords(ver):
+    return _raw_modules(ver) // 8 - _ECC_M[ver] * _BLOCKS_M[ver]
+
+def _gf_mul(x, y):
+    z = 0
+    for i in reversed(range(8)):
+        z = (z << 1) ^ ((z >> 7) * 0x11D)
+        z ^= ((y >> i) & 1) * x
+    return z
+
+def _rs_divisor(degree):
+    res = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            res[j] = _gf_mul(res[j], root)
+            if j + 1 < degree:
+                res[j] ^= res[j + 1]
+        root = _gf_mul(root, 0x02)
+    return res
+
+def _rs_remainder(data, divisor):
+    res = [0] * len(divisor)
+    for b in data:
+        factor = b ^ res.pop(0)
+        res.append(0)
+        for i, coef in enumerate(divisor):
+            res[i] ^= _gf_mul(coef, factor)
+    return res
+
+def _alignment_positions(ver):
+    if ver == 1:
+        return []
+    na = ver // 7 + 2
+    step = (ver * 8 + na * 3 + 5) // (na * 4 - 4) * 2
+    size = ver * 4 + 17
+    return [6] + sorted(size - 7 - i * step for i in range(na - 1))
+
+_MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+class _Matrix:
+    def __init__(self, ver):
+        self.ver, self.size = ver, ver * 4 + 17
+        self.m = [[False] * self.size for _ in range(self.size)]
+        self.fn = [[False] * self.size for _ in range(self.size)]
+
+    def setf(self, x, y, dark):
+        self.m[y][x] = dark
+        self.fn[y][x] = True
+
+    def draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self.setf(6, i, i % 2 == 0)
+            self.setf(i, 6, i % 2 == 0)
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self.setf(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+        pos = _alignment_positions(self.ver)
+        last = len(pos) - 1
+        for i, ax in enumerate(pos):
+            for j, ay in enumerate(pos):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self.setf(ax + dx, ay + dy, max(abs(dx), abs(dy)) != 1)
+        self.draw_format(0)
+        if self.ver >= 7:
+            rem = self.ver
+            for _ in range(12):
+                rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
+            bits = self.ver << 12 | rem
+            for i in range(18):
+                bit = (bits >> i) & 1 == 1
+                a, b = size - 11 + i % 3, i // 3
+                self.setf(a, b, bit)
+                self.setf(b, a, bit)
+
+    def draw_format(self, mask):
+        data = _ECL_M_BITS << 3 | mask
+        rem = data
+        for _ in range(10):
+            rem = (rem << 1) ^ ((rem >> 9) * 0x537)
+        bits = (data << 10 | rem) ^ 0x5412
+        bit = lambda i: (bits >> i) & 1 == 1
+        size = self.size
+        for i in range(6):
+            self.setf(8, i, bit(i))
+        self.setf(8, 7, bit(6))
+        self.setf(8, 8, bit(7))
+        self.setf(7, 8, bit(8))
+        for i in range(9, 15):
+            self.setf(14 - i, 8, bit(i))
+        for i in range(8):
+            self.setf(size - 1 - i, 8, bit(i))
+        for i in range(8, 15):
+            self.setf(8, size - 15 + i, bit(i))
+        self.setf(8, size - 8, True)
+
+    def draw_codewords(self, data):
+        size, i, right = self.size, 0, self.size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            for vert in range(size):
+                for j in range(2):
+                    x = right - j
+                    y = size - 1 - vert if ((right + 1) & 2) == 0 else vert
+                    if not self.fn[y][x] and i < len(data) * 8:
+                        self.m[y][x] = (data[i >> 3] >> (7 - (i & 7))) & 1 == 1
+                        i += 1
+            right -= 2
+
+    def apply_mask(self, mask):
+        f = _MASKS[mask]
+        for y in range(self.size):
+            row, fn = self.m[y], self.fn[y]
+            for x in range(self.size):
+                if not fn[x] and f(x, y):
+                    row[x] = not row[x]
+
+    def penalty(self):
+        m, size, score = self.m, self.size, 0
+        lines = m + [list(col) for col in zip(*m)]
+        finder_a, finder_b = "10111010000", "00001011101"
+        for line in lines:
+            run, prev = 0, None
+            for v in line:
+                if v == prev:
+                    run += 1
+                else:
+                    if run >= 5:
+                        score += run - 2
+                    run, prev = 1, v
+            if run >= 5:
+                score += run - 2
+            s = "".join("1" if v else "0" for v in line)
+            score += 40 * (s.count(finder_a) + s.count(finder_b))
+        for y in range(size - 1):
+            for x in range(size - 1):
+                c = m[y][x]
+                if c == m[y][x + 1] == m[y + 1][x] == m[y + 1][x + 1]:
+                    score += 3
+        dark, total = sum(map(sum, m)), size * size
+        k = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+        return score + k * 10
+
+def encode_matrix(data: bytes, mask: int | None = None, version: int | None = None):
+    """바이트 모드·오류정정 M QR 행렬(list[list[bool]], True=검정)을 반환."""
+    for ver in ([version] if version else range(1, 41)):
+        cc_bits = 8 if ver < 10 else 16
+        if 4 + cc_bits + len(data) * 8 <= _data_codewords(ver) * 8:
+            break
+    else:
+        raise ValueError("QR에 담기에는 데이터가 너무 깁니다")
+    cap = _data_codewords(ver) * 8
+    bits = "0100" + format(len(data), f"0{cc_bits}b") + "".join(format(b, "08b") for b in data)
+    bits += "0" * min(4, cap - len(bits))
+    bits += "0" * (-len(bits) % 8)
+    cw = [int(bits[i:i + 8], 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(cw) < cap // 8:
+        cw.append(pad)
+        pad ^= 0xEC ^ 0x11
+    # 블록 분할 + RS 오류정정 + 인터리브
+    nblocks, ecclen = _BLOCKS_M[ver], _ECC_M[ver]
+    raw = _raw_modules(ver) // 8
+    nshort, shortlen = nblocks - raw % nblocks, raw // nblocks
+    div = _rs_divisor(ecclen)
+    blocks, k = [], 0
+    for i in range(nblocks):
+        dat = cw[k:k + shortlen - ecclen + (0 if i < nshort else 1)]
+        k += len(dat)
+        ecc = _rs_remainder(dat, div)
+        if i < nshort:
+            dat = dat + [0]
+        blocks.append(dat + ecc)
+    final = [blk[i] for i in range(len(blocks[0])) for j, blk in enumerate(blocks)
+             if i != shortlen - ecclen or j >= nshort]
+    qr = _Matrix(ver)
+    qr.draw_function_patterns()
+    qr.draw_codewords(final)
+    if mask is None:
+        best = None
+        for msk in range(8):
+            qr.apply_mask(msk); qr.draw_format(msk)
+            p = qr.penalty()
+            if best is None or p < best[0]:
+                best = (p, msk)
+            qr.apply_mask(msk)   # XOR 이므로 한 번 더 적용하면 원상 복구
+        mask = best[1]
+    qr.apply_mask(mask)
+    qr.draw_format(mask)
+    return qr.m
+
+def _png_chunk(tag, body):
+    return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body) & 0xFFFFFFFF)
+
+def matrix_png(matrix, scale=6, border=4):
+    """QR 행렬을 8비트 흑백 PNG 바이트로(외부 의존성 없음)."""
+    n = len(matrix) + border * 2
+    w = n * scale
+    rows = []
+    blank = b"\x00" + b"\xff" * w
+    for y in range(-border, len(matrix) + border):
+        if 0 <= y < len(matrix):
+            line = [b"\xff" * scale] * border
+            line += [(b"\x00" if v else b"\xff") * scale for v in matrix[y]]
+            line += [b"\xff" * scale] * border
+            row = b"\x00" + b"".join(line)
+        else:
+            row = blank
+        rows.extend([row] * scale)
+    ihdr = struct.pack(">IIBBBBB", w, w, 8, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", ihdr)
+            + _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 9)) + _png_chunk(b"IEND", b""))
+
+# -------------------- 렌더링 + 캐시 --------------------
+def render_png(data: str, scale: int = 6) -> bytes:
+    try:
+        import segno
+    except ImportError:
+        return matrix_png(encode_matrix(data.encode("utf-8")), scale=scale)
+    buf = io.BytesIO()
+    segno.make(data).save(buf, kind="png", scale=scale)
+    return buf.getvalue()
+
+def _cache_file(data, scale, cache_dir):
+    h = hashlib.sha256(f"{scale}|{data}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, h[:2], h + ".png")
+
+def _cache_get(data, scale, cache_dir):
+    if not cache_dir:
+        return None
+    try:
+        with open(_cache_file(data, scale, cache_dir), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _cache_put(data, scale, cache_dir, png):
+    if not cache_dir:
+        return
+    fp = _cache_file(data, scale, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        tmp = f"{fp}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(png)
+        os.replace(tmp, fp)
+    except OSError:
+        pass   # 캐시는 최적화일 뿐
+
+def qr_png_bytes(data_url: str, scale: int = 6, cache_dir: str | None = QR_CACHE_DIR) -> bytes:
+    """URL → QR PNG. 같은 (URL, scale)은 디스크 캐시에서 그대로 반환."""
+    png = _cache_get(data_url, scale, cache_dir)
+    if png is None:
+        png = render_png(data_url, scale)
+        _cache_put(data_url, scale, cache_dir, png)
+    return png
+
+def _render_job(args):
+    data, scale = args
+    return render_png(data, scale)
+
+def render_many(items, scale: int = 6, workers: int | None = None, cache_dir: str | None = QR_CACHE_DIR,
+                progress=None):
+    """[(이름, URL), …] → {이름: PNG}. 캐시에 없는 URL만 프로세스 풀에서 렌더링."""
+    out, todo = {}, []
+    for name, url in items:
+        png = _cache_get(url, scale, cache_dir)
+        if png is None:
+            todo.append((name, url))
+        else:
+            out[name] = png
+    if todo:
+        jobs = [(url, scale) for _, url in todo]
+        if len(todo) < POOL_MIN_ITEMS or workers == 1:
+            results = map(_render_job, jobs)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4)))
+        try:
+            for i, ((name, url), png) in enumerate(zip(todo, results), 1):
+                _cache_put(url, scale, cache_dir, png)
+                out[name] = png
+                if progress:
+                    progress(i, len(todo))
+        finally:
+            if len(todo) >= POOL_MIN_ITEMS and workers != 1:
+                pool.shutdown()
+    return {name: out[name] for name, _ in items}
+
+def build_zip(pngs: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:   # PNG는 이미 압축되어 있음
+        for name, png in pngs.items():
+            z.writestr(f"{name}.png", png)
+    return buf.getvalue()
+
+def build_sheet_pdf(pngs: dict, cols: int = 4, rows: int = 5, dpi: int = 150) -> bytes | None:
+    """A4 여러 쪽 인쇄용 PDF(칸마다 QR + 이름 아래 표기). Pillow 없으면 None."""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return None
+    pw, ph = int(8.27 * dpi), int(11.69 * dpi)
+    cw, ch = pw // cols, ph // rows
+    qr_side = min(cw, ch) - 40
+    pages, names = [], list(pngs)
+    for start in range(0, len(names), cols * rows):
+        page = Image.new("1", (pw, ph), 1)
+        draw = ImageDraw.Draw(page)
+        for k, name in enumerate(names[start:start + cols * rows]):
+            x, y = (k % cols) * cw, (k // cols) * ch
+            img = Image.open(io.BytesIO(pngs[name])).convert("L").resize((qr_side, qr_side), Image.NEAREST)
+            page.paste(img, (x + (cw - qr_side) // 2, y + 8))
+            draw.text((x + 12, y + qr_side + 12), str(name), fill=0)
+        pages.append(page)
+    if not pages:
+        return None
+    buf = io.BytesIO()
+    pages[0].save(buf, format="PDF", save_all=True, append_images=pages[1:], resolution=dpi)
+    return buf.getvalue()
+
+# -------------------- URL 목록 --------------------
+def checkin_url(public_url: str, sid) -> str:
+    return f"{public_url}?mode=checkin&sid={urllib.parse.quote(str(sid))}"
+
+def roster_items(seniors, public_url: str):
+    return [(f"senior_checkin_{sid}", checkin_url(public_url, sid)) for sid in seniors["senior_id"].astype(str)]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="체크인/쿠폰 QR 일괄 생성")
+    ap.add_argument("kind", choices=["seniors", "coupons"])
+    ap.add_argument("src", help="seniors: 명부 CSV, coupons: 규칙 JSON 배열 파일")
+    ap.add_argument("--url", default=os.environ.get("PUBLIC_APP_URL", "http://localhost:8501"))
+    ap.add_argument("--out", default="qr_codes.zip", help=".zip 또는 .pdf")
+    ap.add_argument("--scale", type=int, default=6)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+    if args.kind == "seniors":
+        import pandas as pd
+        items = roster_items(pd.read_csv(args.src, dtype={"senior_id": str}), args.url)
+    else:
+        from coupon import verify_url
+        with open(args.src, encoding="utf-8") as f:
+            rules = json.load(f)
+        items = [(f"coupon_{r.get('code') or i}", verify_url(args.url, r)) for i, r in enumerate(rules)]
+    pngs = render_many(items, scale=args.scale, workers=args.workers,
+                       progress=lambda i, n: print(f"\r{i}/{n}", end="", file=sys.stderr))
+    data = build_sheet_pdf(pngs) if args.out.endswith(".pdf") else build_zip(pngs)
+    if data is None:
+        ap.error("PDF 출력에는 Pillow가 필요합니다")
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(f"\n{len(pngs)}개 → {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
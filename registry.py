@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# 어르신 명부 색인: senior_id → 행 위치(dict) + 이름/ID 접두어 검색(정렬 목록 + bisect)
+# 체크인 조회·PIN 확인·최근 방문일 갱신을 명부 크기와 무관하게 O(1)로 처리합니다.
+# 색인은 프로세스당 하나를 모든 세션이 공유하므로, 갱신(touch/add)은 제자리에서 바꾸지 않고 새 색인을 돌려줌.
+import sys
+from bisect import bisect_left, insort
+import pandas as pd
+import storage
+
+class SeniorRegistry:
+    def __init__(self, df: pd.DataFrame):
+        if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0:
+            df = df.reset_index(drop=True)
+        self.df = df
+        self._col = {c: i for i, c in enumerate(df.columns)}
+        ids = df["senior_id"].astype(str).tolist() if "senior_id" in df else []
+        names = df["name"].astype(str).tolist() if "name" in df else [""] * len(ids)
+        self._pos = dict(zip(ids, range(len(ids))))
+        self._keys = sorted([(n.lower(), s) for n, s in zip(names, ids)] + [(s.lower(), s) for s in ids])
+
+    def __len__(self): return len(self._pos)
+    def __contains__(self, sid): return str(sid) in self._pos
+
+    def _at(self, sid, col):
+        return self.df.iat[self._pos[str(sid)], self._col[col]]
+
+    def get(self, sid):
+        """senior_id 로 1행을 dict로 반환(없으면 None)."""
+        pos = self._pos.get(str(sid))
+        return None if pos is None else self.df.iloc[pos].to_dict()
+
+    def rows(self, sids):
+        """senior_id 목록에 해당하는 행만 (목록 순서대로) 반환."""
+        return self.df.iloc[[self._pos[str(s)] for s in sids if str(s) in self._pos]]
+
+    def label(self, sid):
+        return f"{self._at(sid, 'name')} ({sid})"
+
+    def verify_pin(self, sid, pin: str) -> bool:
+        """PIN 일치 여부. 저장된 PIN 이 비었거나 결측이면 어떤 입력도 통과하지 않음("nan"·"None" 포함)."""
+        if str(sid) not in self._pos or "pin" not in self._col:
+            return False
+        stored = self._at(sid, "pin")
+        if stored is None or pd.isna(stored) or not str(stored).strip():
+            return False
+        return str(stored) == pin
+
+    @property
+    def nbytes(self):
+        # 색인(dict·정렬 목록)만의 대략 크기. DataFrame 은 데이터셋 캐시와 공유하므로 제외
+        return sys.getsizeof(self._pos) + sys.getsizeof(self._keys) + sum(map(sys.getsizeof, self._keys))
+
+    def _derived(self, df, pos, keys):
+        # 같은 색인을 공유하는 새 객체(원본은 그대로 두어, 기록이 실패해도 공유본이 바뀌지 않게)
+        out = object.__new__(SeniorRegistry)
+        out.df, out._pos, out._keys = df, pos, keys
+        out._col = {c: i for i, c in enumerate(df.columns)}
+        return out
+
+    def touch(self, sid, when):
+        """최근 방문일을 갱신한 새 색인 반환(DataFrame 은 해당 열만 복사, 원본은 그대로)."""
+        df = self.df.copy(deep=False)
+        df.iat[self._pos[str(sid)], self._col["last_visit_date"]] = pd.Timestamp(when)
+        return self._derived(df, self._pos, self._keys)
+
+    def add(self, row: pd.DataFrame):
+        """1행 DataFrame(스키마 적용된)을 명부 끝에 추가한 새 색인 반환(원본은 그대로)."""
+        df = storage.concat_rows(self.df, row)
+        pos, keys = dict(self._pos), list(self._keys)
+        base = len(df) - len(row)
+        for i, (sid, name) in enumerate(zip(row["senior_id"].astype(str), row["name"].astype(str))):
+            pos[sid] = base + i
+            insort(keys, (name.lower(), sid))
+            insort(keys, (sid.lower(), sid))
+        return self._derived(df, pos, keys)
+
+    def search(self, q: str, limit: int = 50):
+        """이름 또는 ID 접두어로 최대 limit 명의 senior_id 반환(빈 검색어면 앞에서부터)."""
+        q = (q or "").strip().lower()
+        out, seen = [], set()
+        for key, sid in self._keys[bisect_left(self._keys, (q, "")):]:
+            if not key.startswith(q) or len(out) >= limit:
+                break
+            if sid not in seen:
+                seen.add(sid); out.append(sid)
+        return out
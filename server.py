@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+# 경량 HTTP 엔드포인트: QR 스캔 1건(체크인·쿠폰 검증)을 Streamlit 세션 대신 JSON 요청 1번으로 처리
+#
+#   GET  /health
+#   POST /checkin               {"sid", "pin", "systolic", "diastolic", "weight_kg", "notes", "store"}
+#                               이름은 PIN 이 맞은 뒤 응답에만(ID 만으로 이름을 조회하는 경로는 없음)
+#   GET|POST /coupon            r=<QR 토큰>&amount=<결제 금액>&segment=<도민|관광객>
+#                               서명된 토큰만 받음(구형 JSON 규칙은 누구나 만들 수 있어 403,
+#                               COUPON_ALLOW_UNSIGNED=1 일 때만 허용)
+#   GET  /stats                 엔드포인트별 처리 시간 p50/p95(ms)
+#
+# 체크인은 PIN 이 MAX_PIN_FAILS 번 틀리면 PIN_LOCK_SEC 동안 429. 매장 이름은 요청의 store 또는 JEJU_STORE.
+#
+# 세션·스크립트 실행·화면 렌더링 없이, 앱과 같은 저장소·명부 색인·기록 로직(service.py)과
+# 쿠폰 검증(coupon.py)을 씁니다. 앱과 동시에 띄워 함께 기록할 때는 JEJU_STORAGE=sqlite 권장
+# (CSV 는 체크인마다 명부 파일을 통째로 다시 쓰고, 프로세스 간에는 나중에 쓴 쪽이 이김).
+#
+#   python server.py serve --port 8600
+#   python server.py bench --requests 20000 --procs 4 --conns 8   (임시 데이터로 로컬 서버를 띄워 RPS·p99 측정)
+#   python server.py bench --url http://host:8600              (실제 서버: 쿠폰 검증만, 체크인은 --allow-writes 일 때만)
+import os, sys, json, time, socket, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+import backend, service, perf
+from coupon import UnsignedCoupon, check_coupon_rule, rule_from_param
+
+MAX_PIN_FAILS = 5      # 이 횟수만큼 PIN 이 틀리면
+PIN_LOCK_SEC = 600     # 이 시간(초) 동안 해당 ID 체크인 거부(4자리 PIN 대입 방지)
+
+_fails, _fails_lock = {}, threading.Lock()
+
+def _pin_locked(sid):
+    now = time.monotonic()
+    with _fails_lock:
+        recent = [t for t in _fails.get(sid, ()) if now - t < PIN_LOCK_SEC]
+        _fails[sid] = recent
+        return len(recent) >= MAX_PIN_FAILS
+
+def _pin_failed(sid, ok):
+    with _fails_lock:
+        if ok: _fails.pop(sid, None)
+        else: _fails.setdefault(sid, []).append(time.monotonic())
+
+def _vital(p, key, hi):
+    v = p.get(key)
+    if v in (None, ""):
+        return None
+    v = float(v)
+    if not 0 <= v <= hi:
+        raise ValueError(f"{key} 범위 밖: {v}")
+    return v or None
+
+# -------------------- 엔드포인트 --------------------
+def api_health(db, p):
+    return 200, {"ok": True, "storage": db.kind}
+
+def api_checkin(db, p):
+    sid, pin = str(p.get("sid") or ""), str(p.get("pin") or "")
+    reg = service.senior_registry(db)
+    if sid not in reg:
+        return 404, {"ok": False, "error": "명부에 없는 ID"}
+    if _pin_locked(sid):
+        return 429, {"ok": False, "error": "PIN 오류가 많아 잠시 후 다시 시도하세요"}
+    ok = reg.verify_pin(sid, pin)
+    _pin_failed(sid, ok)
+    if not ok:
+        return 403, {"ok": False, "error": "PIN 불일치"}
+    v = service.record_checkin(db, sid, _vital(p, "systolic", 400), _vital(p, "diastolic", 300),
+                               _vital(p, "weight_kg", 300), p.get("notes", ""), store=p.get("store") or STORE)
+    return 200, {"ok": True, "senior_id": sid, "name": v["name"], "ts": v["ts"]}
+
+def api_coupon(db, p):
+    if not p.get("r"):
+        raise ValueError("r(쿠폰 토큰)이 필요합니다")
+    try:
+        rule, signed = rule_from_param(p["r"])
+    except UnsignedCoupon as e:
+        return 403, {"ok": False, "error": str(e)}
+    ok, res = check_coupon_rule(rule, int(p.get("amount") or 0), segment=p.get("segment") or None)
+    out = {"ok": ok, "signed": signed, "code": rule.get("code")}
+    out.update(res if ok else {"reason": res})
+    return 200, out
+
+def api_stats(db, p):
+    return 200, perf.stats.report()
+
+ROUTES = {("GET", "/health"): api_health, ("POST", "/checkin"): api_checkin, ("GET", "/coupon"): api_coupon,
+          ("POST", "/coupon"): api_coupon, ("GET", "/stats"): api_stats}
+STORE = os.environ.get("JEJU_STORE", "")
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: 매장 단말이 연결을 재사용
+    server_version = "jeju-qr/1"
+
+    def setup(self):
+        super().setup()
+        # 응답 헤더·본문이 따로 나가도 지연 ACK 에 묶이지 않게(요청마다 ~40ms 대기 방지)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *a):
+        pass
+
+    def _send(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        p = dict(parse_qsl(url.query))
+        path = url.path.rstrip("/") or "/"
+        n = int(self.headers.get("Content-Length") or 0)
+        fn = ROUTES.get((method, path))
+        t0 = perf.now()
+        try:
+            if n:
+                body = json.loads(self.rfile.read(n))
+                if not isinstance(body, dict):
+                    raise ValueError("JSON 객체가 필요합니다")
+                p.update(body)
+            code, out = (404, {"ok": False, "error": "없는 경로"}) if fn is None else fn(self.server.db, p)
+        except (ValueError, TypeError) as e:
+            code, out = 400, {"ok": False, "error": str(e)}
+        except Exception as e:
+            code, out = 500, {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self._send(code, out)
+        if fn is not None:
+            perf.stats.since(f"{method} {path}", t0)
+
+    def do_GET(self): self._handle("GET")
+    def do_POST(self): self._handle("POST")
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256   # 아침 러시의 연결 폭주를 backlog 로 흡수
+
+def serve(host="127.0.0.1", port=8600, db=None):
+    backend.ensure_files()
+    srv = Server((host, port), Handler)
+    srv.db = db or backend.get()
+    service.senior_registry(srv.db)   # 첫 요청 전에 명부 색인 적재
+    print(f"listening on http://{host}:{srv.server_address[1]} (storage={srv.db.kind})", file=sys.stderr, flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+# -------------------- 부하 측정 --------------------
+def _bench_conn(url, jobs, n, out):
+    import http.client
+    u = urlsplit(url)
+    conn = http.client.HTTPConnection(u.hostname, u.port, timeout=30)
+    for i in range(n):
+        op, method, path, body = jobs[i % len(jobs)]
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body, {"Content-Type": "application/json"} if body else {})
+            r = conn.getresponse()
+            r.read()
+            ok = r.status == 200
+        except OSError:
+            conn.close()
+            ok = False
+        out.append((op, (time.perf_counter() - t0) * 1000, ok))
+    conn.close()
+
+def _bench_proc(args):
+    url, jobs, conns, n = args
+    outs = [[] for _ in range(conns)]
+    ts = [threading.Thread(target=_bench_conn, args=(url, jobs[c::conns] or jobs, n, outs[c])) for c in range(conns)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return [r for o in outs for r in o]
+
+def _jobs(roster, token, checkin_ratio, n=1000, amount=15000):
+    # 요청 묶음(작업, 메서드, 경로, 본문): 체크인을 checkin_ratio 만큼 고르게 섞고 나머지는 쿠폰 검증
+    from urllib.parse import quote
+    coupon = ("coupon", "GET", f"/coupon?r={token}&amount={amount}&segment={quote('도민')}", None)
+    out = []
+    for i in range(n):
+        if int((i + 1) * checkin_ratio) > int(i * checkin_ratio):
+            sid, pin = roster[i % len(roster)]
+            body = json.dumps({"sid": sid, "pin": pin, "systolic": 110 + i % 40, "diastolic": 80, "weight_kg": 60})
+            out.append(("checkin", "POST", "/checkin", body))
+        else:
+            out.append(coupon)
+    return out
+
+def _pcts(ms):
+    ms = sorted(ms)
+    q = lambda p: round(ms[min(len(ms) - 1, int(p * len(ms)))], 2)
+    return {"p50_ms": q(0.5), "p95_ms": q(0.95), "p99_ms": q(0.99), "max_ms": round(ms[-1], 2)}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _sandbox(seniors):
+    # 임시 작업 폴더에 명부를 만들고 그 폴더에서 서버를 띄움. 저장소는 임시 폴더에 고정(backend.local)해
+    # JEJU_DB 가 실제 DB 절대 경로여도 건드리지 않음. 반환: (임시 폴더, 백엔드, 서버 프로세스용 환경변수)
+    import tempfile
+    import pandas as pd
+    import storage
+    tmp = tempfile.mkdtemp(prefix="jeju-bench-")
+    os.chdir(tmp)
+    backend.ensure_files()
+    db = backend.local()
+    ids = [f"B{i:06d}" for i in range(seniors)]
+    df = pd.DataFrame({"senior_id": ids, "name": [f"부하{i}" for i in range(seniors)], "risk_tier": "일반", "pin": "1234"})
+    db.save("seniors", storage.apply_schema(df.reindex(columns=list(storage.SCHEMAS["seniors"])), "seniors"))
+    env = {**os.environ, "JEJU_DB": os.path.join(tmp, backend.DATA_DIR, "jeju.db")}
+    return tmp, db, env
+
+def bench(url=None, requests=20000, procs=4, conns=8, checkin_ratio=0.2, seniors=2000, allow_writes=False):
+    """로컬 서버에 procs 프로세스 × conns 연결(keep-alive)로 requests 건을 보내고 RPS·분위수 보고.
+    url 이 없으면 임시 데이터로 서버를 띄워 측정(현재 JEJU_STORAGE 사용).
+    url 이 있으면 실제 서버이므로 allow_writes 가 아니면 쿠폰 검증만(체크인 기록 없음)."""
+    import subprocess
+    from concurrent.futures import ProcessPoolExecutor
+    from coupon import encode_token
+    proc, home, tmp, db = None, os.getcwd(), None, None
+    if url is not None and checkin_ratio and not allow_writes:
+        print("--url: 실제 서버에 체크인을 기록하지 않도록 쿠폰 검증만 측정합니다(--allow-writes 로 허용)",
+              file=sys.stderr)
+        checkin_ratio = 0
+    if url is None:
+        tmp, db, env = _sandbox(seniors)
+        port = _free_port()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)], env=env)
+        url = f"http://127.0.0.1:{port}"
+        for _ in range(300):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+    try:
+        roster = []
+        if checkin_ratio:
+            reg = service.senior_registry(db or backend.get())
+            roster = [(s, str(reg.get(s)["pin"])) for s in reg.search("", limit=1000)]
+        if checkin_ratio and not roster:
+            raise SystemExit("명부가 비어 있어 체크인을 측정할 수 없습니다(--checkin 0 으로 쿠폰만 측정)")
+        token = encode_token({"segment": "도민", "days": list("월화수목금토일"), "time_from": "00:00",
+                              "time_to": "23:59", "discount_pct": 10, "min_spend": 10000,
+                              "care_fund_rate_pct": 1, "code": "BENCH"})
+        jobs = _jobs(roster, token, checkin_ratio)
+        per = max(1, requests // (procs * conns))
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(procs) as pp:
+            rows = [r for part in pp.map(_bench_proc, [(url, jobs[p::procs] or jobs, conns, per) for p in range(procs)])
+                    for r in part]
+        secs = time.perf_counter() - t0
+    finally:
+        if proc is not None:
+            proc.terminate(); proc.wait()
+    kind = (db or backend.get()).kind
+    if tmp:
+        import shutil
+        os.chdir(home)
+        shutil.rmtree(tmp, ignore_errors=True)
+    out = {"url": url, "storage": kind, "procs": procs, "conns": procs * conns,
+           "requests": len(rows), "seconds": round(secs, 2), "rps": round(len(rows) / secs, 1),
+           "errors": sum(not ok for _, _, ok in rows), **_pcts([ms for _, ms, _ in rows])}
+    for op in sorted({op for op, _, _ in rows}):
+        ms = [m for o, m, _ in rows if o == op]
+        out[op] = {"requests": len(ms), **_pcts(ms)}
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="체크인·쿠폰 검증 HTTP 엔드포인트")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("serve")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=8600)
+    b = sub.add_parser("bench")
+    b.add_argument("--url", help="이미 떠 있는 서버(현재 폴더의 쿠폰 키 사용, 기본은 쿠폰 검증만). 없으면 임시 데이터로 띄움")
+    b.add_argument("--requests", type=int, default=20000)
+    b.add_argument("--procs", type=int, default=4)
+    b.add_argument("--conns", type=int, default=8, help="프로세스당 동시 연결 수")
+    b.add_argument("--checkin", type=float, default=0.2, help="요청 중 체크인 비율(나머지는 쿠폰 검증)")
+    b.add_argument("--allow-writes", action="store_true",
+                   help="--url 서버에도 체크인을 보냄(실제 방문 기록·최근 방문일이 바뀜). 없으면 --url 은 쿠폰 검증만")
+    b.add_argument("--seniors", type=int, default=2000, help="임시 데이터의 명부 인원")
+    args = ap.parse_args(argv)
+    if args.cmd == "serve":
+        serve(args.host, args.port)
+    else:
+        print(json.dumps(bench(args.url, args.requests, args.procs, args.conns, args.checkin, args.seniors,
+                               args.allow_writes),
+                         ensure_ascii=False, indent=1))
+
+if __name__ == "__main__":
+    main()
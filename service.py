@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# 앱(streamlit_app.py)과 HTTP 엔드포인트(server.py)가 함께 쓰는 기록 로직
+#
+# 명부 색인·바이탈 분석은 데이터셋 버전별로 프로세스당 하나(storage.cache)를 공유하고,
+# 기록(체크인·등록)은 저장소에 쓴 뒤 공유본·대시보드 집계를 다시 읽지 않고 넘깁니다.
+import os
+from datetime import datetime, date
+import pandas as pd
+import storage, aggregates, alerts, backend, vitals
+from registry import SeniorRegistry
+
+PATH_AGG = os.path.join(backend.DATA_DIR, "aggregates.json")
+
+def registry_key(db): return f"registry:{db.kind}"
+def vitals_key(db): return f"vitals:{db.kind}"
+
+def senior_registry(db) -> SeniorRegistry:
+    # 명부 색인은 명부 버전별로 하나. 이 프로세스의 체크인·등록은 색인을 다시 만들지 않고 갱신 후 버전만 넘김
+    return storage.cache.get(registry_key(db), lambda _: SeniorRegistry(db.load("seniors")),
+                             version=lambda: db.version("seniors"))
+
+def vitals_analysis(db) -> vitals.Vitals:
+    # 바이탈 분석도 방문기록 버전별로 하나. 이 프로세스의 체크인은 해당 어르신만 다시 계산해 넘김
+    return storage.cache.get(vitals_key(db), lambda _: vitals.Vitals(db.load("visits")),
+                             version=lambda: db.version("visits"))
+
+def record_checkin(db, sid, systolic=None, diastolic=None, weight=None, notes="", store=""):
+    """방문 1건 기록 + 최근 방문일 갱신, 기록한 행(dict) 반환. PIN 확인은 호출하는 쪽에서."""
+    with db.write_lock:   # 색인 갱신 → 기록 → 공유본 반영을 한 묶음으로(업로드 병합도 같은 잠금)
+        reg = senior_registry(db)   # 잠금 안에서 최신 색인을 잡아야 앞선 체크인의 방문일을 덮어쓰지 않음
+        row = reg.get(sid)
+        v = {"ts": datetime.utcnow().isoformat(), "senior_id": sid, "name": row["name"],
+             "store": store, "systolic": systolic or "", "diastolic": diastolic or "",
+             "weight_kg": weight or "", "notes": notes or ""}
+        before, tier, prev = db.versions(), row.get("risk_tier"), row.get("last_visit_date")
+        reg = reg.touch(sid, date.today())   # 새 색인: 기록이 끝난 뒤에만 공유본으로 교체
+        db.checkin(v, sid, date.today(), reg.df)
+        after = db.versions()
+        storage.cache.advance(registry_key(db), before["seniors"], after["seniors"], lambda _: reg)
+        storage.cache.advance(vitals_key(db), before["visits"], after["visits"],
+                              lambda vt: vt.add(storage.apply_schema(pd.DataFrame([v]), "visits")))
+        alerts.on_checkin(before["seniors"], after["seniors"], sid, tier, date.today())
+    aggregates.update(PATH_AGG, before, after, lambda a: a.on_visit(v, tier, prev, date.today()))
+    return v
+
+def add_senior(db, rec: dict):
+    """어르신 1명 등록(색인·명부·집계 반영)."""
+    with db.write_lock:
+        reg, before = senior_registry(db), db.versions()
+        reg = reg.add(storage.apply_schema(pd.DataFrame([rec]), "seniors"))
+        db.add_senior(rec, reg.df)
+        after = db.versions()
+        storage.cache.advance(registry_key(db), before["seniors"], after["seniors"], lambda _: reg)
+        alerts.on_senior_added(before["seniors"], after["seniors"], {k: v for k, v in rec.items() if k != "pin"})
+    aggregates.update(PATH_AGG, before, after, lambda a: a.on_senior_added(rec.get("risk_tier")))
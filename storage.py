@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+# 데이터 저장소: 스키마 적재 · 장부 저널 · 데이터셋 캐시
+import os, io, csv, json, shutil, itertools, threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# 캐시된 데이터셋은 모든 세션이 같은 객체를 읽으므로, 파생 DataFrame(필터·정렬·열 추가)과
+# 갱신본이 원본 버퍼를 공유하다가 쓰는 순간에만 해당 열을 복사하도록 copy-on-write 를 켬
+pd.set_option("mode.copy_on_write", True)
+
+# -------------------- 스키마 --------------------
+# 데이터셋별 선언형 스키마. 형식: str / category / int / float / date(일 단위) / datetime
+SCHEMAS = {
+    "actions": {"phase": "category", "task": "str", "owner": "category", "cost_krw": "int",
+                "due": "date", "status": "category", "segment": "category", "impact_score": "int"},
+    "seniors": {"senior_id": "str", "name": "str", "phone": "str", "address": "str",
+                "caregiver": "str", "caregiver_phone": "str", "risk_tier": "category",
+                "welfare_points": "int", "pin": "str", "last_visit_date": "date"},
+    "visits":  {"ts": "datetime", "senior_id": "str", "name": "str", "store": "category",
+                "systolic": "float", "diastolic": "float", "weight_kg": "float", "notes": "str"},
+    "fund":    {"ts": "datetime", "type": "category", "amount": "int", "store": "category",
+                "memo": "str", "donation_rate": "int"},
+}
+
+def parse_dates(s: pd.Series) -> pd.Series:
+    """벡터화 날짜 파싱: ISO 8601 고속 경로 후, 실패한 값만 혼합 형식으로 재시도.
+
+    저장 시각은 UTC 기준 naive 로 통일합니다(앱은 datetime.utcnow() 로 기록). 오프셋이 붙은 값은
+    UTC 로 바꾸고, 오프셋이 없는 값은 UTC 로 봅니다. 한 열에 오프셋이 섞여 있어도 같은 규칙.
+    """
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.tz_convert(None) if getattr(s.dt, "tz", None) is not None else s
+    txt = s.astype("string").str.strip()
+    out = pd.to_datetime(txt, format="ISO8601", errors="coerce", utc=True)
+    rest = out.isna() & txt.notna() & (txt != "")
+    if rest.any():
+        out[rest] = pd.to_datetime(txt[rest], format="mixed", errors="coerce", utc=True)
+    return out.dt.tz_convert(None)
+
+def _to_int(s):
+    n = pd.to_numeric(s, errors="coerce")
+    v = n.dropna()
+    return n.astype("Int64") if (v == v.round()).all() else n
+
+def apply_schema(df: pd.DataFrame, name=None) -> pd.DataFrame:
+    """스키마에 선언된 열만 형 변환(없는 열·추가 열은 그대로)."""
+    schema = SCHEMAS.get(name)
+    if not schema or df is None:
+        return df
+    df = df.copy()
+    for col, kind in schema.items():
+        if col not in df:
+            continue
+        s = df[col]
+        if kind == "str":
+            df[col] = s.where(s.isna(), s.astype(str)).astype(object)
+        elif kind == "category":
+            df[col] = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+        elif kind == "int":
+            df[col] = _to_int(s)
+        elif kind == "float":
+            df[col] = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif kind == "date":
+            df[col] = parse_dates(s).dt.normalize()
+        elif kind == "datetime":
+            df[col] = parse_dates(s)
+    return df
+
+def row_hash(df: pd.DataFrame, cols):
+    """cols 값 기준 행 해시(uint64). parquet·SQLite·CSV 적재 간 dtype 차이(단위, Int64/float, 범주형)는 정규화."""
+    part = {}
+    for c in cols:
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s): s = s.astype("datetime64[ns]")
+        elif pd.api.types.is_numeric_dtype(s): s = s.astype("float64")
+        elif isinstance(s.dtype, pd.CategoricalDtype): s = s.astype(object)
+        part[c] = s
+    return pd.util.hash_pandas_object(pd.DataFrame(part, index=df.index), index=False).to_numpy()
+
+def concat_rows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """df 끝에 rows 를 이어 붙인 새 DataFrame. 범주형 열은 범주를 넓혀 범주형으로 유지(object 로 풀리지 않게)."""
+    rows = rows.reindex(columns=df.columns)
+    for col in df.columns:
+        s, r = df[col], rows[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            extra = pd.Index(r.dropna().unique()).difference(s.cat.categories)
+            if len(extra):
+                df = df.assign(**{col: s.cat.add_categories(extra)})
+            rows = rows.assign(**{col: pd.Categorical(r, categories=df[col].cat.categories)})
+        elif r.isna().all() and r.dtype != s.dtype and s.dtype.kind not in "iub":
+            rows = rows.assign(**{col: r.astype(s.dtype)})   # 빈 열 때문에 dtype 이 object 로 풀리지 않게
+    if not len(df):
+        return rows.reset_index(drop=True)
+    if not len(rows):
+        return df.reset_index(drop=True)
+    return pd.concat([df, rows], ignore_index=True)
+
+def newest(df: pd.DataFrame, col, start=0, stop=None) -> pd.DataFrame:
+    """col 내림차순으로 [start, stop) 행(표 한 쪽). 전체를 정렬·복사하지 않고 앞쪽 stop 행만 부분 정렬.
+    빈 값은 맨 뒤."""
+    stop = len(df) if stop is None else min(stop, len(df))
+    if start >= stop:
+        return df.iloc[:0]
+    s = df[col]
+    if pd.api.types.is_datetime64_any_dtype(s):
+        key = ~s.to_numpy().view("i8")   # NaT(최솟값) → 최댓값
+    else:
+        key = -np.nan_to_num(pd.to_numeric(s, errors="coerce").to_numpy("float64"), nan=-np.inf)
+    part = np.argpartition(key, stop - 1)[:stop] if stop < len(key) else np.arange(len(key))
+    part = part[np.argsort(key[part], kind="stable")]
+    return df.iloc[part[start:stop]]
+
+def read_csv_typed(src, name=None, **kw):
+    # 문자열 열은 처음부터 str로 읽어 PIN·ID의 앞자리 0을 보존
+    schema = SCHEMAS.get(name) or {}
+    dtype = {c: str for c, k in schema.items() if k == "str"}
+    if "names" in kw:
+        dtype = {c: t for c, t in dtype.items() if c in kw["names"]}
+    return apply_schema(pd.read_csv(src, dtype=dtype or None, **kw), name)
+
+# ---- 열 기반 스냅샷: CSV 옆에 .parquet 으로 저장, 원본 (inode, mtime, size)가 같으면 텍스트 파싱 생략 ----
+try:
+    import pyarrow as pa, pyarrow.parquet as pq
+except Exception:   # pyarrow 없으면 CSV만 사용
+    pa = pq = None
+
+def snapshot_path(path): return os.path.splitext(path)[0] + ".parquet"
+
+def _src_key(path):
+    s = os.stat(path)
+    return f"{s.st_ino}:{s.st_mtime_ns}:{s.st_size}".encode()   # 교체(os.replace)는 inode 가 바뀜
+
+def load_snapshot(path, name=None):
+    """CSV 1개를 스키마대로 적재. 유효한 parquet 스냅샷이 있으면 그것을 읽고, 없으면 만들어 둠."""
+    if pq is None or name is None:
+        return read_csv_typed(path, name)
+    sp, key = snapshot_path(path), _src_key(path)
+    try:
+        t = pq.read_table(sp)
+        if (t.schema.metadata or {}).get(b"jeju_src") == key:
+            return t.to_pandas()
+    except Exception:
+        pass
+    df = read_csv_typed(path, name)
+    try:
+        t = pa.Table.from_pandas(df, preserve_index=False)
+        t = t.replace_schema_metadata({**(t.schema.metadata or {}), b"jeju_src": key})
+        tmp = _tmp_path(sp)
+        pq.write_table(t, tmp)
+        os.replace(tmp, sp)
+    except Exception:
+        pass   # 스냅샷은 캐시일 뿐이므로 실패해도 CSV 결과 사용
+    return df
+
+# -------------------- 장부 저널 --------------------
+#   data/visits.csv               ← 스냅샷(헤더 포함, 압축 시에만 새로 씀)
+#   data/visits.csv.journal       ← 헤더 없는 CSV 행, 기록마다 한 줄 append + fsync
+#   data/visits.csv.compacting    ← 압축 중인 저널(압축 도중 종료되면 다음 적재 때 함께 재생)
+#   data/visits.csv.compacted     ← 새 스냅샷(.compacting 포함)의 inode·크기. 스냅샷 교체 후 .compacting 을
+#                                   지우기 전에 종료되면, 이것과 일치하는 스냅샷이면 .compacting 은 이미 반영된 것
+#
+# 기록 1건은 저널 끝에 한 줄만 쓰므로 이력 크기와 무관하게 O(1)입니다.
+JOURNAL_SUFFIX = ".journal"
+COMPACTING_SUFFIX = ".compacting"
+COMPACT_BYTES = 4 * 1024 * 1024   # 저널이 이 크기를 넘으면 백그라운드 압축
+
+_locks: dict[str, tuple[threading.Lock, threading.Lock]] = {}
+_locks_guard = threading.Lock()
+_headers: dict[str, list[str]] = {}
+_compacting: set[str] = set()
+
+def journal_path(path): return path + JOURNAL_SUFFIX
+def _compacting_path(path): return path + COMPACTING_SUFFIX
+def _marker_path(path): return path + ".compacted"
+
+def _stat_key(st): return [st.st_ino, st.st_size]
+_tmp_seq = itertools.count()
+def _tmp_path(path): return f"{path}.{os.getpid()}.{next(_tmp_seq)}.tmp"   # 쓸 때마다 다른 임시 파일(동시 교체끼리 덮어쓰지 않게)
+
+def _merged(path):
+    """.compacting 이 이미 스냅샷에 들어갔는지(교체 직후 종료된 경우). swap_lock 안에서 호출."""
+    try:
+        with open(_marker_path(path), encoding="utf-8") as f:
+            key = json.load(f)
+        return key == _stat_key(os.stat(path))
+    except (OSError, ValueError):
+        return False
+
+def _finish_compaction(path):
+    # .compacting → .compacted 순서로 지움(반대로 지우면 종료 시 .compacting 이 다시 재생됨)
+    for fp in (_compacting_path(path), _marker_path(path)):
+        if os.path.exists(fp):
+            os.remove(fp)
+
+def _path_locks(path):
+    # (append_lock, swap_lock): 저널 교체와 append, 스냅샷 교체와 적재를 각각 직렬화
+    key = os.path.abspath(path)
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = (threading.Lock(), threading.Lock())
+        return _locks[key]
+
+def _header(path):
+    if path not in _headers:
+        with open(path, newline="", encoding="utf-8") as f:
+            _headers[path] = next(csv.reader(f), [])
+    return _headers[path]
+
+def _read_tail(fp, names, name=None):
+    # 동시에 쓰이는 중일 수 있으므로 마지막 줄바꿈 이후(미완성 행)는 버림
+    try:
+        with open(fp, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    raw = raw[:raw.rfind(b"\n") + 1]
+    if not raw:
+        return None
+    return read_csv_typed(io.BytesIO(raw), name, header=None, names=names)
+
+def append_record(path, rec: dict):
+    """rec 1건을 저널 끝에 추가하고 fsync. 스냅샷 헤더 순서를 따르며 없는 키는 빈칸."""
+    cols = _header(path)
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(["" if rec.get(c) is None else rec.get(c) for c in cols])
+    _append_bytes(path, buf.getvalue().encode("utf-8"))
+
+def append_frame(path, df: pd.DataFrame):
+    """여러 행을 저널 끝에 한 번에 추가하고 fsync 1회(대량 적재용). 헤더 순서를 따름."""
+    if not len(df):
+        return
+    data = df.reindex(columns=_header(path)).to_csv(index=False, header=False, lineterminator="\n")
+    _append_bytes(path, data.encode("utf-8"))
+
+def _append_bytes(path, data: bytes):
+    append_lock, _ = _path_locks(path)
+    with append_lock:
+        fd = os.open(journal_path(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def load_ledger(path, name=None):
+    """스냅샷 + (압축 중 저널) + 저널 꼬리를 이어 붙여 전체 장부를 반환."""
+    _, swap_lock = _path_locks(path)
+    with swap_lock:
+        if os.path.exists(_compacting_path(path)) and _merged(path):
+            _finish_compaction(path)
+        base = load_snapshot(path, name)
+        names = list(base.columns)
+        parts = [base]
+        for fp in (_compacting_path(path), journal_path(path)):
+            tail = _read_tail(fp, names, name)
+            if tail is not None:
+                parts.append(tail)
+    if len(parts) == 1:
+        return base
+    return apply_schema(pd.concat(parts, ignore_index=True), name)
+
+def compact_ledger(path):
+    """저널을 스냅샷에 합쳐 새 스냅샷을 원자적으로 교체. 압축 중에도 append는 막히지 않음.
+    압축 중 replace_ledger 로 장부가 통째로 바뀌면 이 압축 결과는 버리고 False."""
+    append_lock, swap_lock = _path_locks(path)
+    jp, cp, mp = journal_path(path), _compacting_path(path), _marker_path(path)
+    with append_lock, swap_lock:
+        # 이름 바꾸기는 적재(swap_lock)와도 직렬화: 적재가 .compacting·.journal 사이에서 꼬리를 놓치지 않게
+        if os.path.exists(cp) and _merged(path):
+            _finish_compaction(path)   # 스냅샷 교체 후 정리 전에 중단됨 → 다시 합치면 중복
+        # 이전 압축이 교체 전에 중단된 경우 .compacting 이 남아 있으므로 그것부터 처리
+        if not os.path.exists(cp):
+            if not os.path.exists(jp) or os.path.getsize(jp) == 0:
+                return False
+            if os.path.exists(mp):
+                os.remove(mp)   # 이전 정리 중 종료로 남은 표시: 새 .compacting 을 반영된 것으로 오인하지 않게
+            os.replace(jp, cp)
+        src = open(path, "rb")
+        base = _stat_key(os.fstat(src.fileno()))
+        # 파싱 없이 바이트 그대로 이어 붙임(원본 표기 보존)
+        with open(cp, "rb") as f:
+            tail = f.read()
+    tail = tail[:tail.rfind(b"\n") + 1]
+    tmp = _tmp_path(path)
+    try:
+        with src, open(tmp, "wb") as f:
+            shutil.copyfileobj(src, f)
+            if f.tell() and not _ends_with_newline(path):
+                f.write(b"\n")
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+            key = _stat_key(os.fstat(f.fileno()))   # rename 해도 inode·크기는 그대로
+        mtmp = _tmp_path(mp)
+        with open(mtmp, "w", encoding="utf-8") as f:
+            json.dump(key, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(mtmp, mp)
+        with swap_lock:
+            if not os.path.exists(cp) or _stat_key(os.stat(path)) != base:
+                # replace_ledger 가 이미 전체를(.compacting 포함) 새로 썼음 → 옛 스냅샷으로 되돌리지 않음
+                if os.path.exists(mp):
+                    os.remove(mp)
+                return False
+            os.replace(tmp, path)
+            _finish_compaction(path)
+        return True
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def write_csv(path, df: pd.DataFrame):
+    """CSV 스냅샷을 통째로 교체. 임시 파일에 쓴 뒤 바꿔치기하므로 읽는 쪽은 이전 것 또는 새 것만 봄."""
+    tmp = _tmp_path(path)
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def replace_ledger(path, df: pd.DataFrame):
+    """장부 전체를 새 스냅샷으로 교체하고 저널을 비움(병합·중복 제거 등 전체 재작성용)."""
+    append_lock, swap_lock = _path_locks(path)
+    tmp = _tmp_path(path)
+    with append_lock:
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            df.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        with swap_lock:
+            os.replace(tmp, path)
+            for fp in (journal_path(path), _compacting_path(path), _marker_path(path)):
+                if os.path.exists(fp):
+                    os.remove(fp)
+        _headers.pop(path, None)
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def maybe_compact(path, threshold=COMPACT_BYTES):
+    """저널이 threshold 바이트를 넘으면 데몬 스레드로 압축 시작(이미 진행 중이면 무시)."""
+    try:
+        if os.path.getsize(journal_path(path)) < threshold:
+            return False
+    except FileNotFoundError:
+        return False
+    with _locks_guard:
+        if path in _compacting:
+            return False
+        _compacting.add(path)
+
+    def _run():
+        try:
+            compact_ledger(path)
+        finally:
+            with _locks_guard:
+                _compacting.discard(path)
+
+    threading.Thread(target=_run, name=f"compact:{os.path.basename(path)}", daemon=True).start()
+    return True
+
+# -------------------- 데이터셋 캐시 --------------------
+# 경로별로 (파일 mtime/size + 저널 상태)를 버전으로 삼아, 바뀐 데이터셋만 다시 읽음.
+# 프로세스 전역이라 모든 세션이 같은 캐시를 공유합니다.
+def file_version(path):
+    ver = []
+    for fp in (path, journal_path(path), _compacting_path(path)):
+        try:
+            s = os.stat(fp)
+            ver.append((s.st_ino, s.st_mtime_ns, s.st_size))   # 같은 크기로 같은 시각 안에 교체돼도 구분
+        except FileNotFoundError:
+            ver.append(None)
+    return tuple(ver)
+
+def _nbytes(obj):
+    # 문자열(object) 열은 deep 로 세야 실제 크기(아니면 칸당 8바이트로 잡혀 max_bytes 가 무의미)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, bytes):
+        return len(obj)
+    return int(getattr(obj, "nbytes", 0))
+
+def _resized(old, nb, new):
+    # 갱신본 크기: 같은 DataFrame 에 몇 행 더한 것이면 행 수 비율로 추정(deep 계산은 O(n)이라 기록마다 안 함)
+    if isinstance(new, pd.DataFrame) and isinstance(old, pd.DataFrame) and len(old):
+        return int(nb * len(new) / len(old))
+    return _nbytes(new)
+
+class DatasetCache:
+    def __init__(self, max_entries=16, max_bytes=512 * 1024 * 1024):
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self._data = OrderedDict()   # path -> (version, df, nbytes)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, path, loader, version=None):
+        # version 을 주지 않으면 파일 버전(mtime/size)을 사용(SQLite 등은 세대 번호를 넘김).
+        # 버전을 읽는 함수를 주면: 어긋날 때 한 번 더 읽어(그 사이 다른 스레드의 기록이 캐시를 앞서
+        # 넘겼을 수 있음) 확인하고, 적재 전후 버전이 같을 때만 보관(오래된 버전으로 덮어쓰지 않게)
+        if callable(version): read = version
+        elif version is None: read = lambda: file_version(path)
+        else: read = lambda: version
+        ver = read()
+        with self._lock:
+            ent = self._data.get(path)
+        if ent is not None and ent[0] != ver:
+            ver = read()
+        with self._lock:
+            ent = self._data.get(path)
+            if ent is not None and ent[0] == ver:
+                self._data.move_to_end(path)
+                self.hits += 1
+                return ent[1]
+            self.misses += 1
+        df = loader(path)
+        if read() != ver:
+            return df
+        with self._lock:
+            self._data[path] = (ver, df, _nbytes(df))
+            self._data.move_to_end(path)
+            self._evict()
+        return df
+
+    def advance(self, path, before, after, fn):
+        """이 프로세스가 방금 한 기록을 캐시본에 반영(디스크 재적재 없음).
+        캐시 버전이 before 일 때만 fn(캐시본) → 새 객체를 after 버전으로 저장하고, 어긋나면 버려서
+        다음 get 때 다시 읽게 함. 다른 세션이 읽는 중이므로 fn 은 캐시본 DataFrame 을 제자리에서
+        바꾸지 말고 새 DataFrame 을 반환(copy-on-write 라 실제로는 바뀐 열만 복사됨)."""
+        with self._lock:
+            ent = self._data.get(path)
+            if ent is None or ent[0] != before:
+                self._data.pop(path, None)
+                return
+            obj = fn(ent[1])
+            self._data[path] = (after, obj, _resized(ent[1], ent[2], obj))
+            self._evict()
+
+    def _evict(self):
+        total = sum(e[2] for e in self._data.values())
+        while len(self._data) > 1 and (len(self._data) > self.max_entries or total > self.max_bytes):
+            _, (_, _, nb) = self._data.popitem(last=False)
+            total -= nb
+            self.evictions += 1
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None: self._data.clear()
+            else: self._data.pop(path, None)
+
+    def objects(self):
+        with self._lock:
+            return [e[1] for e in self._data.values()]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._data), "bytes": sum(e[2] for e in self._data.values())}
+
+cache = DatasetCache()
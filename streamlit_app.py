@@ -1,92 +1,89 @@
 # -*- coding: utf-8 -*-
-import os, io, json, random, string, urllib.parse
+import os, random, string
 import streamlit as st
 import pandas as pd
-from dateutil import parser
-from datetime import datetime, date, time
+from datetime import datetime, time
+import storage, aggregates, alerts, backend, ingest, perf, vitals, service
+from coupon import make_coupon, check_coupon_rule, rule_from_param, UnsignedCoupon, verify_url as coupon_verify_url
+import qrgen
+from qrgen import qr_png_bytes
 
 st.set_page_config(page_title="Jeju SME · Welfare + QR (Final)", layout="wide")
+_run_started = perf.now()
+
+# -------------------- 경로/저장소 --------------------
+from backend import (PATH_ROADMAP, PATH_SENIORS, PATH_VISITS, PATH_FUND,
+                     PATHS, SAMPLE_ACTIONS)
+from service import PATH_AGG
+
+db = backend.get()   # JEJU_STORAGE=csv(기본)|sqlite
+NAME_OF = {p: n for n, p in PATHS.items()}
 
-# -------------------- 경로/샘플 --------------------
-DATA_DIR = "data"
-PATH_ROADMAP = os.path.join(DATA_DIR, "actions.csv")
-PATH_SENIORS = os.path.join(DATA_DIR, "seniors.csv")
-PATH_VISITS  = os.path.join(DATA_DIR, "visits.csv")
-PATH_FUND    = os.path.join(DATA_DIR, "fund_ledger.csv")
-
-SAMPLE_ACTIONS = [
-    {"phase":"단기(1~6개월)","task":"제주어 병기 메뉴판/영수증 적용","owner":"매장","cost_krw":50000,"due":"2025-10-01","status":"진행중","segment":"도민","impact_score":3},
-    {"phase":"단기(1~6개월)","task":"도민 전용 주소인증 할인 시범","owner":"매장","cost_krw":0,"due":"2025-10-15","status":"계획","segment":"도민","impact_score":4},
-    {"phase":"중기(6~12개월)","task":"생활 구독(커피+빵) 출시","owner":"연합","cost_krw":200000,"due":"2026-02-01","status":"계획","segment":"도민","impact_score":5},
-    {"phase":"중기(6~12개월)","task":"원데이 체험 클래스(향토/공예)","owner":"협업","cost_krw":150000,"due":"2026-03-01","status":"계획","segment":"관광객","impact_score":4},
-]
-
-def _ensure_dir(): os.makedirs(DATA_DIR, exist_ok=True)
-
-def ensure_files():
-    _ensure_dir()
-    if not os.path.exists(PATH_ROADMAP):
-        pd.DataFrame(SAMPLE_ACTIONS).to_csv(PATH_ROADMAP, index=False)
-    if not os.path.exists(PATH_SENIORS):
-        pd.DataFrame(columns=[
-            "senior_id","name","phone","address","caregiver","caregiver_phone",
-            "risk_tier","welfare_points","pin","last_visit_date"
-        ]).to_csv(PATH_SENIORS, index=False)
-    if not os.path.exists(PATH_VISITS):
-        pd.DataFrame(columns=["ts","senior_id","name","store","systolic","diastolic","weight_kg","notes"])\
-          .to_csv(PATH_VISITS, index=False)
-    if not os.path.exists(PATH_FUND):
-        pd.DataFrame(columns=["ts","type","amount","store","memo","donation_rate"])\
-          .to_csv(PATH_FUND, index=False)
-
-@st.cache_data
 def load_df(path, fallback=None):
-    ensure_files()
+    # 데이터셋·버전 단위 캐시(백엔드가 버전을 알려줌): 바뀐 데이터셋만 다시 읽음
+    # 파일이 없을 때만 fallback. 읽기 오류는 빈 표로 숨기지 않고 그대로 드러냄(장부가 조용히 사라지지 않게)
     try:
-        return pd.read_csv(path)
-    except Exception:
-        return fallback if fallback is not None else pd.DataFrame()
+        return db.load(NAME_OF[path])
+    except FileNotFoundError:
+        if fallback is None:
+            raise
+        return fallback
 
 def save_df(path, df):
-    df.to_csv(path, index=False)
-    st.cache_data.clear()
-
-def clean_date(x):
-    try: return parser.parse(str(x)).date()
-    except: return None
-
-def phase_rank(x): return {"단기(1~6개월)":0,"중기(6~12개월)":1,"장기(1~3년)":2}.get(x,99)
-
-def make_coupon(prefix="JEJU", n=6):
-    return f"{prefix}-" + "".join(random.choices(string.ascii_uppercase+string.digits, k=n))
-
-def _kor_day(dt: datetime):
-    return ["월","화","수","목","금","토","일"][dt.weekday()]
-
-def check_coupon_rule(rule: dict, cart_amount: int, segment: str | None = None, now: datetime | None = None):
-    now = now or datetime.now()
-    if segment and rule.get("segment") and segment != rule["segment"]:
-        return (False, "세그먼트 불일치")
-    if _kor_day(now) not in rule["days"]:
-        return (False, "적용 요일 아님")
-    cur = now.strftime("%H:%M")
-    if not (rule["time_from"] <= cur <= rule["time_to"]):
-        return (False, "적용 시간대 아님")
-    if cart_amount < rule["min_spend"]:
-        return (False, "최소 결제액 미만")
-    discount = int(round(cart_amount * rule["discount_pct"] / 100))
-    care_fund = int(round(cart_amount * rule.get("care_fund_rate_pct", 0) / 100))
-    return (True, {"discount": discount, "care_fund": care_fund})
-
-# ---- QR 생성: segno 있으면 내부 PNG, 없으면 None (호출부에서 외부 QR 폴백) ----
-def qr_png_bytes(data_url: str, scale: int = 6):
-    try:
-        import segno
-        buf = io.BytesIO()
-        segno.make(data_url).save(buf, kind="png", scale=scale)
-        return buf.getvalue()
-    except Exception:
-        return None  # 폴백은 호출부에서
+    db.save(NAME_OF[path], df)
+
+def append_ledger(path, rec: dict):
+    db.append(NAME_OF[path], rec)
+
+def _agg_sources():
+    return db.versions()
+
+def dashboard_aggregates():
+    # 저장된 집계(원본 버전이 다르면 그때만 전체 재계산)
+    return aggregates.current(PATH_AGG, _agg_sources(), lambda: aggregates.Aggregates.rebuild(
+        load_df(PATH_SENIORS), load_df(PATH_VISITS), load_df(PATH_FUND)))
+
+def write_fund(rec: dict):
+    before = _agg_sources()
+    append_ledger(PATH_FUND, rec)
+    aggregates.update(PATH_AGG, before, _agg_sources(), lambda a: a.on_fund(rec))
+
+def typed_row(rec: dict, name: str):
+    # 화면 갱신용 1행 DataFrame (기존 열과 dtype을 맞춰 정렬·비교가 깨지지 않게)
+    return storage.apply_schema(pd.DataFrame([rec]), name)
+
+def roadmap():
+    return load_df(PATH_ROADMAP, storage.apply_schema(pd.DataFrame(SAMPLE_ACTIONS), "actions"))
+
+def senior_registry():
+    return service.senior_registry(db)
+
+def vitals_analysis():
+    return service.vitals_analysis(db)
+
+PAGE_ROWS = 50
+
+def page_rows(df, key, by="ts"):
+    # 큰 표는 최신순 한 쪽(PAGE_ROWS 행)만 골라 브라우저로 보냄
+    pages = max(1, -(-len(df) // PAGE_ROWS))
+    page = st.number_input(f"쪽 (전체 {pages:,}쪽 · {len(df):,}행)", 1, pages, 1, key=key) if pages > 1 else 1
+    return storage.newest(df, by, (page - 1) * PAGE_ROWS, page * PAGE_ROWS)
+
+def ledger_download(path, label, file_name):
+    # 장부·명부 CSV 직렬화는 행 수에 비례해 느리므로 재실행마다 하지 않음: 누른 세션에만, 그 버전의 공유본으로 제공
+    # (데이터가 바뀌면 다시 "준비"를 눌러야 함)
+    name, ver = NAME_OF[path], db.version(NAME_OF[path])
+    if st.button(f"{label} 준비", key=f"csv_prep:{name}"):
+        st.session_state[f"csv_ready:{name}"] = ver
+    if st.session_state.get(f"csv_ready:{name}") == ver:
+        data = storage.cache.get(f"csv:{db.kind}:{name}", lambda _: load_df(path).to_csv(index=False).encode("utf-8-sig"),
+                                 version=ver)
+        st.download_button(label, data, file_name, "text/csv")
+
+def record_checkin(sid, systolic, diastolic, weight, notes):
+    return service.record_checkin(db, sid, systolic, diastolic, weight, notes, store=STORE)
+
+PHASE_RANK = {"단기(1~6개월)":0,"중기(6~12개월)":1,"장기(1~3년)":2}
 
 # -------------------- 사이드바 --------------------
 st.sidebar.title("제주 소상공인 × 복지 통합 보드 + QR")
@@ -96,37 +93,45 @@ PUBLIC_URL = st.sidebar.text_input(
     value=os.environ.get("PUBLIC_APP_URL", "http://localhost:8501"),
     help="Cloud 주소 또는 로컬 주소 (예: https://your-app.streamlit.app)"
 )
-st.sidebar.caption("CSV 업로드 시 즉시 반영됩니다.")
+st.sidebar.caption("업로드한 CSV는 저장소에 병합됩니다(키 기준 추가·갱신, 같은 파일은 한 번만).")
 up_actions = st.sidebar.file_uploader("로드맵 CSV 업로드", type=["csv"])
 up_seniors = st.sidebar.file_uploader("어르신 명부 CSV 업로드", type=["csv"])
 up_visits  = st.sidebar.file_uploader("방문기록 CSV 업로드", type=["csv"])
 up_fund    = st.sidebar.file_uploader("기금 장부 CSV 업로드", type=["csv"])
+with st.sidebar.expander("데이터 캐시 상태"):
+    st.caption(f"저장소: {db.kind}")
+    st.json(storage.cache.stats())
+with st.sidebar.expander("재실행 시간(ms, 전체 접속자)"):
+    st.json(perf.stats.report())
+with st.sidebar.expander("메모리(bytes)"):
+    st.json(perf.memory_report(st.session_state, storage.cache))
 
 # -------------------- 데이터 적재 --------------------
-if "actions" not in st.session_state:  st.session_state.actions = load_df(PATH_ROADMAP, pd.DataFrame(SAMPLE_ACTIONS))
-if "seniors" not in st.session_state:  st.session_state.seniors = load_df(PATH_SENIORS)
-if "visits"  not in st.session_state:  st.session_state.visits  = load_df(PATH_VISITS)
-if "fund"    not in st.session_state:  st.session_state.fund    = load_df(PATH_FUND)
-
-# 업로드 즉시 반영
-if up_actions is not None: st.session_state.actions = pd.read_csv(up_actions)
-if up_seniors is not None: st.session_state.seniors = pd.read_csv(up_seniors)
-if up_visits  is not None: st.session_state.visits  = pd.read_csv(up_visits)
-if up_fund    is not None: st.session_state.fund    = pd.read_csv(up_fund)
-
-actions = st.session_state.actions.copy()
-seniors = st.session_state.seniors.copy()
-visits  = st.session_state.visits.copy()
-fund    = st.session_state.fund.copy()
-
-if "due" in actions: actions["due"] = actions["due"].apply(clean_date)
-if "last_visit_date" in seniors: seniors["last_visit_date"] = seniors["last_visit_date"].apply(clean_date)
-if "ts" in visits:
-    try: visits["ts"] = pd.to_datetime(visits["ts"])
-    except: pass
-if "ts" in fund:
-    try: fund["ts"] = pd.to_datetime(fund["ts"])
-    except: pass
+# 데이터셋은 세션에 담지 않음: 모든 세션이 프로세스 공유본(버전별 1개, 읽기 전용)을 load_df 로 읽고,
+# 기록은 저장소에 바로 반영되어 공유본이 새 버전으로 넘어감
+
+# 업로드는 청크 단위로 검증해 저장소에 키 기준 병합. 첨부된 파일은 세션당 한 번만 확인하고
+# (재실행마다 다시 읽지 않음), 같은 내용(SHA-256)은 저장소에 한 번만 반영
+uploads = {"actions": up_actions, "seniors": up_seniors, "visits": up_visits, "fund": up_fund}
+ingested = st.session_state.setdefault("ingested_uploads", {})
+for name, up in uploads.items():
+    if up is None: continue
+    if up.file_id not in ingested:
+        bar = st.sidebar.progress(0.0, f"{up.name} 병합 중…")
+        try:
+            ingested[up.file_id] = ingest.ingest_once(db, name, up, progress=lambda done, total, rows:
+                bar.progress(min(done / max(total, 1), 1.0), f"{up.name} 병합 중… {rows:,}행"))
+        except ValueError as e:
+            ingested[up.file_id] = ({"error": str(e)}, False)
+        bar.empty()
+    summary, fresh = ingested[up.file_id]
+    if "error" in summary: st.sidebar.error(f"{up.name}: {summary['error']}")
+    elif not fresh: st.sidebar.caption(f"{up.name}: 이미 반영된 파일입니다.")
+    else:
+        st.sidebar.caption(f"{up.name}: 추가 {summary['added']:,} · 갱신 {summary['updated']:,} · "
+                           f"동일 {summary['unchanged']:,} · 반려 {summary['rejected']:,}")
+        if summary["rejected"]:
+            st.sidebar.caption(f"반려 행(일부): {summary['rejected_lines']}")
 
 # -------------------- 헤더 & URL 파라미터 --------------------
 st.title("🌊 제주 소상공인 · 복지 통합 실행 보드 (Final)")
@@ -137,16 +142,24 @@ except Exception:
     params = st.experimental_get_query_params()
 
 def qget(key: str):
-    if not isinstance(params, dict): return None
+    if not hasattr(params, "get"): return None
     v = params.get(key)
     return v[0] if isinstance(v, list) else v
 
+# 화면·폼은 프래그먼트로 분리: 위젯을 조작하면 그 프래그먼트만 다시 실행됨.
+# 프래그먼트 재실행 때는 이 파일의 나머지가 돌지 않으므로 데이터는 화면 함수 안에서 읽음
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
 # ① 쿠폰 QR 스캔 즉시 검증 (?r=...)
-r_param = qget("r")
-if r_param:
+@fragment
+@perf.stats.timed("QR 쿠폰 검증")
+def coupon_check_page(r_param):
     st.subheader("🔎 QR 쿠폰 즉시 검증")
     try:
-        loaded_rule = json.loads(urllib.parse.unquote(r_param))
+        loaded_rule, signed = rule_from_param(r_param)
+        if not signed:
+            # 이전 형식(URL-인코딩 JSON)은 서명이 없어 위조 가능 → COUPON_ALLOW_UNSIGNED=1 일 때만 여기까지 옴
+            st.warning("서명 없는 구형 쿠폰 QR입니다(임시 허용 중). 새 QR로 교체하세요.")
         st.success("QR에서 쿠폰 규칙을 불러왔습니다.")
         seg_input = st.selectbox("사용자 세그먼트", ["도민","관광객"], index=0 if loaded_rule.get("segment")=="도민" else 1)
         amt = st.number_input("결제 금액(₩)", 0, 10**9, 15000, step=1000)
@@ -161,53 +174,61 @@ if r_param:
         with st.expander("쿠폰 규칙 보기"):
             st.json(loaded_rule)
         st.info("※ 현재 서버시간 기준으로 검증합니다.")
+    except UnsignedCoupon as e:
+        st.error(str(e))
     except Exception as e:
         st.error(f"QR 쿠폰 규칙 해석 오류: {e}")
 
 # ② 어르신 체크인 QR 스캔 모드 (?mode=checkin&sid=...)
-if qget("mode") == "checkin" and qget("sid"):
+@fragment
+@perf.stats.timed("QR 체크인")
+def checkin_page(sid):
     st.subheader("🧓 QR 체크인")
-    sid = qget("sid")
-    row = seniors[seniors["senior_id"] == sid]
-    if len(row)==0:
+    reg = senior_registry()
+    row = reg.get(sid)
+    if row is None:
         st.error(f"명부에 없는 ID입니다: {sid}")
-    else:
-        row = row.iloc[0]
-        st.info(f"{row['name']} 어르신 체크인")
-        pin_in = st.text_input("PIN 입력")
-        systolic = st.number_input("수축기 혈압", 0, 400, 0)
-        diastolic = st.number_input("이완기 혈압", 0, 300, 0)
-        weight = st.number_input("체중(kg)", 0.0, 300.0, 0.0, step=0.1)
-        notes = st.text_input("비고")
-        if st.button("체크인 기록"):
-            if str(row.get("pin","")) != pin_in:
-                st.error("PIN 불일치")
-            else:
-                v = {"ts": datetime.utcnow().isoformat(), "senior_id": sid, "name": row["name"],
-                     "store": STORE, "systolic": systolic or "", "diastolic": diastolic or "",
-                     "weight_kg": weight or "", "notes": notes}
-                visits = pd.concat([visits, pd.DataFrame([v])], ignore_index=True)
-                seniors.loc[seniors["senior_id"]==sid, "last_visit_date"] = date.today().isoformat()
-                save_df(PATH_VISITS, visits); save_df(PATH_SENIORS, seniors)
-                st.success("체크인 완료! (장부에 반영됨)")
-
-# -------------------- 탭 --------------------
-tabs = st.tabs(["전략 요약", "로드맵", "복지 허브(업로드 반영 + QR)", "오퍼 연구소(QR 쿠폰)", "기금/대시보드"])
+        return
+    st.info(f"{row['name']} 어르신 체크인")
+    pin_in = st.text_input("PIN 입력", key="qr_pin")
+    systolic = st.number_input("수축기 혈압", 0, 400, 0, key="qr_sys")
+    diastolic = st.number_input("이완기 혈압", 0, 300, 0, key="qr_dia")
+    weight = st.number_input("체중(kg)", 0.0, 300.0, 0.0, step=0.1, key="qr_wt")
+    notes = st.text_input("비고", key="qr_notes")
+    if st.button("체크인 기록", key="qr_checkin"):
+        if not reg.verify_pin(sid, pin_in):
+            st.error("PIN 불일치")
+        else:
+            record_checkin(sid, systolic, diastolic, weight, notes)
+            st.success("체크인 완료! (장부에 반영됨)")
+
+if qget("r"): coupon_check_page(qget("r"))
+if qget("mode") == "checkin" and qget("sid"): checkin_page(qget("sid"))
+
+# -------------------- 화면 --------------------
+# st.tabs 는 보이지 않는 탭까지 매번 모두 계산하므로, 선택한 화면 하나만 그림
+VIEWS = ["전략 요약", "로드맵", "복지 허브(업로드 반영 + QR)", "건강 추이", "오퍼 연구소(QR 쿠폰)", "기금/대시보드"]
+view = st.radio("화면", VIEWS, horizontal=True, key="view", label_visibility="collapsed")
 
 # ---- 1) 전략 요약 ----
-with tabs[0]:
+@fragment
+@perf.stats.timed("전략 요약")
+def view_summary():
     st.subheader("📌 전략 요약")
-    counts = actions.groupby("phase")["task"].count().to_dict()
+    actions = roadmap()
+    counts = actions.groupby("phase", observed=True)["task"].count().to_dict()
     st.markdown(f"""
 - **생활(도민) 실행**: {counts.get('단기(1~6개월)',0)}
 - **체험(관광객) 실행**: {counts.get('중기(6~12개월)',0)}
-- **복지 허브 지표**: 어르신 {len(seniors)}명 / 방문기록 {len(visits)}건 / 기금 {len(fund)}건
+- **복지 허브 지표**: 어르신 {len(load_df(PATH_SENIORS))}명 / 방문기록 {len(load_df(PATH_VISITS))}건 / 기금 {len(load_df(PATH_FUND))}건
 """)
     if len(actions):
-        st.bar_chart(actions.groupby("phase")["task"].count())
+        st.bar_chart(actions.groupby("phase", observed=True)["task"].count())
 
 # ---- 2) 로드맵 ----
-with tabs[1]:
+@fragment
+@perf.stats.timed("로드맵")
+def view_roadmap():
     st.subheader("🗺️ 로드맵 관리")
     with st.form("add_action", clear_on_submit=True):
         c = st.columns([1,2,1,1,1,1,1])
@@ -223,36 +244,43 @@ with tabs[1]:
         ok = i2[1].form_submit_button("추가")
         if ok and task.strip():
             new = {"phase":phase,"task":task,"owner":owner,"cost_krw":cost,"due":due.isoformat(),"status":status,"segment":segment,"impact_score":impact}
-            actions = pd.concat([actions, pd.DataFrame([new])], ignore_index=True)
-            save_df(PATH_ROADMAP, actions)
+            save_df(PATH_ROADMAP, storage.concat_rows(roadmap(), typed_row(new, "actions")))
             st.success("작업이 추가되었습니다.")
 
+    actions = roadmap()
     f1, f2, f3, f4 = st.columns(4)
     fil_phase = f1.multiselect("단계", sorted(actions["phase"].dropna().unique().tolist()))
     fil_status = f2.multiselect("상태", sorted(actions["status"].dropna().unique().tolist()))
     fil_seg = f3.multiselect("세그먼트", sorted(actions["segment"].dropna().unique().tolist()))
     fil_q = f4.text_input("검색")
 
-    adf = actions.copy()
-    adf["due"] = adf["due"].apply(clean_date)
+    adf = actions
     if fil_phase: adf = adf[adf["phase"].isin(fil_phase)]
     if fil_status: adf = adf[adf["status"].isin(fil_status)]
     if fil_seg: adf = adf[adf["segment"].isin(fil_seg)]
     if fil_q: adf = adf[adf["task"].str.contains(fil_q, case=False, na=False)]
-    adf["phase_rank"] = adf["phase"].apply(phase_rank)
+    adf = adf.assign(phase_rank=adf["phase"].astype(object).map(PHASE_RANK).fillna(99))
     adf = adf.sort_values(["phase_rank","due"]).drop(columns=["phase_rank"])
     st.dataframe(adf, use_container_width=True)
     st.download_button("로드맵 CSV 다운로드", adf.to_csv(index=False).encode("utf-8-sig"), "jeju_roadmap.csv", "text/csv")
 
 # ---- 3) 복지 허브 (업로드 반영 + 체크인 QR 생성) ----
-with tabs[2]:
+@fragment
+@perf.stats.timed("복지 허브")
+def view_welfare():
     st.subheader("🧓 복지 허브(업로드 반영 + QR 생성)")
+    reg = senior_registry()
     colA, colB = st.columns([1,1])
 
+    # 명부 검색(이름/ID 접두어) 결과만 표·선택 목록에 올림
+    q_senior = st.text_input("명부 검색(이름 또는 ID 앞부분)", key="senior_q")
+    found = reg.search(q_senior, limit=50)
+
     with colA:
         st.markdown("### 어르신 명부")
-        st.dataframe(seniors, use_container_width=True)
-        st.download_button("명부 CSV 다운로드", seniors.to_csv(index=False).encode("utf-8-sig"), "seniors.csv", "text/csv")
+        st.caption(f"전체 {len(reg)}명 중 검색 결과 {len(found)}명 표시(최대 50)")
+        st.dataframe(reg.rows(found), use_container_width=True)
+        ledger_download(PATH_SENIORS, "명부 CSV 다운로드", "seniors.csv")
 
         st.markdown("### 신규 등록")
         with st.form("add_senior", clear_on_submit=True):
@@ -267,62 +295,109 @@ with tabs[2]:
             ok = st.form_submit_button("등록")
             if ok and name.strip():
                 sid = "S" + "".join(random.choices(string.digits, k=6))
+                while sid in reg: sid = "S" + "".join(random.choices(string.digits, k=6))
                 if not pin.strip(): pin = "".join(random.choices(string.digits, k=4))
                 new = {"senior_id":sid,"name":name,"phone":phone,"address":address,
                        "caregiver":cg,"caregiver_phone":cg_phone,"risk_tier":risk,
-                       "welfare_points":points,"pin":pin,"last_visit_date":""}
-                seniors = pd.concat([seniors, pd.DataFrame([new])], ignore_index=True)
-                save_df(PATH_SENIORS, seniors)
+                       "welfare_points":points,"pin":pin,"last_visit_date":None}
+                service.add_senior(db, new)
                 st.success(f"등록 완료! ID:{sid}, PIN:{pin}")
 
     with colB:
         st.markdown("### 체크인(현장 처리)")
-        if len(seniors)==0:
+        if len(reg)==0:
             st.info("먼저 어르신을 등록하거나 CSV를 업로드하세요.")
         else:
-            sel = st.selectbox("대상자", seniors["name"]+" ("+seniors["senior_id"]+")")
-            sid = sel.split("(")[-1][:-1]
+            sid = st.selectbox("대상자", found, format_func=reg.label)
             pin_in = st.text_input("체크인 PIN")
             systolic = st.number_input("수축기 혈압", 0, 400, 0)
             diastolic = st.number_input("이완기 혈압", 0, 300, 0)
             weight = st.number_input("체중(kg)", 0.0, 300.0, 0.0, step=0.1)
             notes = st.text_input("비고")
-            if st.button("체크인 기록"):
-                row = seniors[seniors["senior_id"]==sid].iloc[0]
-                if str(row.get("pin","")) != pin_in:
+            if st.button("체크인 기록", disabled=sid is None):
+                if not reg.verify_pin(sid, pin_in):
                     st.error("PIN 불일치")
                 else:
-                    v = {"ts": datetime.utcnow().isoformat(), "senior_id": sid, "name": row["name"],
-                         "store": STORE, "systolic": systolic or "", "diastolic": diastolic or "",
-                         "weight_kg": weight or "", "notes": notes}
-                    visits = pd.concat([visits, pd.DataFrame([v])], ignore_index=True)
-                    seniors.loc[seniors["senior_id"]==sid, "last_visit_date"] = date.today().isoformat()
-                    save_df(PATH_VISITS, visits); save_df(PATH_SENIORS, seniors)
+                    record_checkin(sid, systolic, diastolic, weight, notes)
                     st.success("체크인 완료!")
 
         st.markdown("### 🧾 어르신별 ‘체크인용’ QR 생성")
-        if len(seniors):
-            who = st.selectbox("QR 생성 대상", seniors["name"]+" ("+seniors["senior_id"]+")", key="qrsel")
-            sid2 = who.split("(")[-1][:-1]
-            checkin_url = f"{PUBLIC_URL}?mode=checkin&sid={urllib.parse.quote(sid2)}"
+        if found:
+            sid2 = st.selectbox("QR 생성 대상", found, format_func=reg.label, key="qrsel")
+            checkin_url = qrgen.checkin_url(PUBLIC_URL, sid2)
             st.write("체크인 URL:")
             st.code(checkin_url, language="text")
 
             png = qr_png_bytes(checkin_url, scale=6)
-            if png:
-                st.image(png, caption="스마트폰 스캔 → 체크인 화면", use_column_width=False)
-                st.download_button("체크인 QR PNG 다운로드", data=png, file_name=f"senior_checkin_{sid2}.png", mime="image/png")
-            else:
-                qr_url = "https://api.qrserver.com/v1/create-qr-code/?size=300x300&data=" + urllib.parse.quote_plus(checkin_url)
-                st.image(qr_url, caption="(외부 서비스) 스캔하여 체크인", use_column_width=False)
-                st.write(f"[QR 링크 열기]({qr_url})")
+            st.image(png, caption="스마트폰 스캔 → 체크인 화면", use_column_width=False)
+            st.download_button("체크인 QR PNG 다운로드", data=png, file_name=f"senior_checkin_{sid2}.png", mime="image/png")
+
+        # 명부 전체 일괄 생성(캐시에 없는 것만 프로세스 풀로 렌더링)
+        if len(reg) and st.button(f"명부 전체 체크인 QR 일괄 생성 ({len(reg)}명)"):
+            bar = st.progress(0.0, "QR 생성 중…")
+            pngs = qrgen.render_many(qrgen.roster_items(reg.df, PUBLIC_URL), scale=6,
+                                     progress=lambda i, n: bar.progress(i / n, f"QR 생성 중… {i}/{n}"))
+            st.session_state.roster_qr = (qrgen.build_zip(pngs), qrgen.build_sheet_pdf(pngs))
+            bar.empty()
+        if "roster_qr" in st.session_state:
+            z, pdf = st.session_state.roster_qr
+            st.download_button("체크인 QR 묶음(ZIP)", data=z, file_name="senior_checkin_qr.zip", mime="application/zip")
+            if pdf:
+                st.download_button("인쇄용 QR 시트(PDF)", data=pdf, file_name="senior_checkin_qr.pdf", mime="application/pdf")
 
         st.markdown("### 방문 기록")
-        st.dataframe(visits.sort_values("ts", ascending=False), use_container_width=True)
-        st.download_button("방문기록 CSV", visits.to_csv(index=False).encode("utf-8-sig"), "visits.csv", "text/csv")
+        visits = load_df(PATH_VISITS)
+        st.dataframe(page_rows(visits, "visits_page"), use_container_width=True)
+        ledger_download(PATH_VISITS, "방문기록 CSV", "visits.csv")
+
+# ---- 4) 건강 추이(혈압·체중) ----
+@fragment
+@perf.stats.timed("건강 추이")
+def view_vitals():
+    st.subheader("🩺 건강 추이(혈압·체중)")
+    vt = vitals_analysis()
+    if not len(vt):
+        st.info("혈압·체중이 기록된 방문이 없습니다.")
+        return
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("### 지역 전체")
+        r, unit = vt.rollup()
+        st.caption(f"측정 {len(vt):,}건 · {unit} 단위 평균(차트 점 {len(r):,}개)")
+        st.line_chart(r[["systolic", "diastolic"]])
+        st.bar_chart(r[["readings", "flagged"]])
+
+        st.markdown("### 이상·급변 측정(최신순)")
+        st.caption(f"고혈압 ≥{vitals.SYS_HIGH}/{vitals.DIA_HIGH} · 저혈압 <{vitals.SYS_LOW}/{vitals.DIA_LOW} · "
+                   f"직전 {vt.window}회 평균 대비 수축기 ±{vitals.SYS_JUMP} 또는 체중 ±{vitals.WEIGHT_JUMP:.0%}")
+        page = page_rows(vt.flagged(), "vitals_flag_page")
+        st.dataframe(page[["ts", "senior_id", "name"] + vitals.VITALS].assign(이상=vitals.flag_labels(page)),
+                     use_container_width=True)
 
-# ---- 4) 오퍼 연구소(QR 쿠폰) ----
-with tabs[3]:
+    with c2:
+        st.markdown("### 어르신별 추이")
+        reg = senior_registry()
+        found = reg.search(st.text_input("명부 검색(이름 또는 ID 앞부분)", key="vitals_q"), limit=50)
+        sid = st.selectbox("대상자", found, format_func=reg.label, key="vitals_sid")
+        one = vt.senior(sid) if sid else vt.df.iloc[:0]
+        if not len(one):
+            st.info("측정 기록이 없습니다.")
+            return
+        st.caption(f"측정 {len(one):,}건 · 최근 {vt.window}회 이동 평균")
+        bp = vitals.downsample(one, ["systolic", "diastolic"]).set_index("ts")
+        st.line_chart(bp[["systolic", "systolic_avg", "diastolic", "diastolic_avg"]])
+        wt = vitals.downsample(one, ["weight_kg"]).set_index("ts")
+        if wt["weight_kg"].notna().any():
+            st.line_chart(wt[["weight_kg", "weight_kg_avg"]])
+        bad = one[one[list(vitals.FLAGS)].any(axis=1)]
+        if len(bad):
+            st.dataframe(bad.iloc[::-1].head(PAGE_ROWS)[["ts"] + vitals.VITALS].assign(이상=vitals.flag_labels(bad)),
+                         use_container_width=True)
+
+# ---- 5) 오퍼 연구소(QR 쿠폰) ----
+@fragment
+@perf.stats.timed("오퍼 연구소")
+def view_offer():
     st.subheader("🎟️ 오퍼 연구소 (QR 쿠폰)")
     c = st.columns(4)
     seg = c[0].selectbox("대상", ["도민","관광객"])
@@ -350,24 +425,29 @@ with tabs[3]:
         st.success("쿠폰 규칙이 생성되었습니다.")
         st.json(rule, expanded=False)
 
-        enc = urllib.parse.quote(json.dumps(rule, ensure_ascii=False))
-        verify_url = f"{PUBLIC_URL}?r={enc}"
+        verify_url = coupon_verify_url(PUBLIC_URL, rule)
         st.write("검증 URL:")
         st.code(verify_url, language="text")
 
         png = qr_png_bytes(verify_url, scale=6)
-        if png:
-            st.image(png, caption="QR 스캔 → 쿠폰 검증 화면", use_column_width=False)
-            st.download_button("쿠폰 QR PNG 다운로드", data=png, file_name=f"coupon_{code}.png", mime="image/png")
-        else:
-            qr_url = "https://api.qrserver.com/v1/create-qr-code/?size=300x300&data=" + urllib.parse.quote_plus(verify_url)
-            st.image(qr_url, caption="(외부 서비스) 스캔하여 쿠폰 검증", use_column_width=False)
-            st.write(f"[QR 링크 열기]({qr_url})")
+        st.image(png, caption="QR 스캔 → 쿠폰 검증 화면", use_column_width=False)
+        st.download_button("쿠폰 QR PNG 다운로드", data=png, file_name=f"coupon_{code}.png", mime="image/png")
 
         st.download_button("쿠폰 규칙 JSON", data=pd.Series(rule).to_json(), file_name=f"coupon_{code}.json")
-
-# ---- 5) 기금/대시보드 ----
-with tabs[4]:
+        st.session_state.setdefault("coupon_rules", []).append(rule)
+
+    # 이번 세션에서 만든 쿠폰 규칙들의 QR 묶음
+    made = st.session_state.get("coupon_rules", [])
+    if made:
+        items = [(f"coupon_{r['code']}", coupon_verify_url(PUBLIC_URL, r)) for r in made]
+        pngs = qrgen.render_many(items, scale=6)
+        st.download_button(f"생성한 쿠폰 QR 묶음(ZIP, {len(made)}개)", data=qrgen.build_zip(pngs),
+                           file_name="coupon_qr.zip", mime="application/zip")
+
+# ---- 6) 기금/대시보드 ----
+@fragment
+@perf.stats.timed("기금/대시보드")
+def view_fund():
     st.subheader("💚 돌봄기금 · 경영 대시보드(경량)")
     c1, c2 = st.columns(2)
     with c1:
@@ -379,35 +459,39 @@ with tabs[4]:
         if st.button("기록 추가"):
             rec = {"ts": datetime.utcnow().isoformat(), "type": ("in" if t.startswith("수입") else "out"),
                    "amount": amt, "store": STORE, "memo": memo, "donation_rate": rate}
-            fund = pd.concat([fund, pd.DataFrame([rec])], ignore_index=True)
-            save_df(PATH_FUND, fund)
+            write_fund(rec)
             st.success("기록 완료")
         st.markdown("### 장부")
-        st.dataframe(fund.sort_values("ts", ascending=False), use_container_width=True)
-        st.download_button("장부 CSV 다운로드", fund.to_csv(index=False).encode("utf-8-sig"), "fund_ledger.csv", "text/csv")
+        fund = load_df(PATH_FUND)
+        st.dataframe(page_rows(fund, "fund_page"), use_container_width=True)
+        ledger_download(PATH_FUND, "장부 CSV 다운로드", "fund_ledger.csv")
 
     with c2:
         st.markdown("### 핵심 지표")
-        total_in  = pd.to_numeric(fund.loc[fund["type"]=="in","amount"], errors="coerce").fillna(0).sum()
-        total_out = pd.to_numeric(fund.loc[fund["type"]=="out","amount"], errors="coerce").fillna(0).sum()
-        balance = int(total_in - total_out)
-        at_df = seniors.copy()
-        at_df["last_visit_date"] = at_df["last_visit_date"].apply(clean_date)
-        at_df["days_from_last"] = at_df["last_visit_date"].apply(lambda d: (date.today()-d).days if isinstance(d, date) else 10**9)
-        at_risk = int((at_df["days_from_last"]>=7).sum())
+        agg = dashboard_aggregates()
+        by_tier = agg.overdue_by_tier(days=alerts.TIER_DAYS)
 
         m = st.columns(4)
-        m[0].metric("어르신 수", len(seniors))
-        m[1].metric("경보(7일↑) 대상", at_risk)
-        m[2].metric("방문 기록(총)", len(visits))
-        m[3].metric("돌봄기금 잔액(₩)", balance)
+        m[0].metric("어르신 수", agg.senior_total)
+        m[1].metric("방문 연체 경보 대상", sum(by_tier.values()),
+                    help=" · ".join(f"{t} {d}일" for t, d in alerts.TIER_DAYS.items()) + " 이상 미방문")
+        m[2].metric("방문 기록(총)", agg.visit_total)
+        m[3].metric("돌봄기금 잔액(₩)", agg.balance)
+        if by_tier:
+            st.caption(" · ".join(f"{t} {n}명" for t, n in sorted(by_tier.items())))
+        recent = alerts.recent(n=20)
+        if recent:
+            with st.expander(f"최근 경보(보관함) {len(recent)}명"):
+                st.dataframe(pd.DataFrame(recent), use_container_width=True, hide_index=True)
 
         try:
-            if len(fund):
-                fdf = fund.copy(); fdf["ts"] = pd.to_datetime(fdf["ts"]).dt.date
-                st.bar_chart(fdf.groupby("ts")["amount"].sum())
-            if len(visits):
-                vdf = visits.copy(); vdf["ts"] = pd.to_datetime(vdf["ts"]).dt.date
-                st.bar_chart(vdf.groupby("ts")["name"].count())
+            if agg.fund_daily:
+                st.bar_chart(pd.Series(agg.fund_daily, name="amount").sort_index())
+            if agg.visit_daily:
+                st.bar_chart(pd.Series(agg.visit_daily, name="visits").sort_index())
         except Exception:
             st.caption("차트 표시를 건너뜁니다.")
+
+{VIEWS[0]: view_summary, VIEWS[1]: view_roadmap, VIEWS[2]: view_welfare,
+ VIEWS[3]: view_vitals, VIEWS[4]: view_offer, VIEWS[5]: view_fund}[view]()
+perf.stats.since("전체 실행", _run_started)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# 쿠폰 ?r= 해석: 서명 없는 구형 JSON 규칙은 명시적으로 허용할 때만
+import os, sys, json, urllib.parse
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import coupon
+
+RULE = {"segment": "도민", "days": list("월화수목금토일"), "time_from": "00:00", "time_to": "23:59",
+        "discount_pct": 100, "min_spend": 0, "care_fund_rate_pct": 1, "code": "X"}
+
+@pytest.mark.parametrize("r", [json.dumps(RULE), urllib.parse.quote(json.dumps(RULE))])
+def test_unsigned_rejected_by_default(r, monkeypatch):
+    monkeypatch.setattr(coupon, "ALLOW_UNSIGNED", False)
+    with pytest.raises(coupon.UnsignedCoupon):
+        coupon.rule_from_param(r)
+    assert coupon.rule_from_param(r, allow_unsigned=True) == (RULE, False)
+
+def test_signed_token(monkeypatch):
+    monkeypatch.setenv("COUPON_SECRET", "test-secret")
+    rule, signed = coupon.rule_from_param(coupon.encode_token({**RULE, "discount_pct": 10}))
+    assert signed and rule["discount_pct"] == 10
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# CSV 업로드 병합: 업로드에 없는 열은 저장된 값을 지우지 않아야 함(CSV·SQLite 저장소 모두)
+import io, os, sys, threading
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage, backend, ingest, service
+
+@pytest.fixture(params=["csv", "sqlite"])
+def db(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    storage.cache.invalidate()
+    backend.ensure_files()
+    db = backend.CsvBackend() if request.param == "csv" else backend.SqliteBackend(
+        os.path.join(backend.DATA_DIR, "jeju.db"), import_on_empty=False)
+    db.save("seniors", storage.apply_schema(pd.DataFrame([
+        {"senior_id": "S1", "name": "김수정", "phone": "010-1", "risk_tier": "일반",
+         "welfare_points": 30, "pin": "0012", "last_visit_date": "2025-01-01"},
+        {"senior_id": "S2", "name": "박영희", "risk_tier": "고위험", "pin": "0034",
+         "last_visit_date": "2025-02-01"},
+    ]), "seniors"))
+    yield db
+    storage.cache.invalidate()
+
+def _upload(db, text):
+    return ingest.ingest(db, "seniors", io.BytesIO(text.encode("utf-8")))
+
+def _row(db, sid):
+    df = db.load("seniors")
+    return df[df["senior_id"] == sid].iloc[0]
+
+def test_partial_columns_keep_stored_values(db):
+    out = _upload(db, "senior_id,name,pin\nS1,김수정,9999\nS3,이철수,0056\n")
+    assert (out["added"], out["updated"]) == (1, 1)
+    s1 = _row(db, "S1")
+    assert s1["pin"] == "9999"
+    assert s1["risk_tier"] == "일반"
+    assert s1["phone"] == "010-1"
+    assert s1["welfare_points"] == 30
+    assert s1["last_visit_date"] == pd.Timestamp("2025-01-01")
+    assert _row(db, "S2")["risk_tier"] == "고위험"
+    s3 = _row(db, "S3")
+    assert s3["name"] == "이철수" and pd.isna(s3["risk_tier"])
+    assert len(db.load("seniors")) == 3
+
+def test_same_values_in_subset_is_unchanged(db):
+    out = _upload(db, "senior_id,name,pin\nS1,김수정,0012\n")
+    assert (out["added"], out["updated"], out["unchanged"]) == (0, 0, 1)
+    assert _row(db, "S1")["last_visit_date"] == pd.Timestamp("2025-01-01")
+
+def test_supplied_column_overwrites(db):
+    out = _upload(db, "senior_id,risk_tier,last_visit_date\nS2,일반,2025-03-01\n")
+    assert out["updated"] == 1
+    s2 = _row(db, "S2")
+    assert (s2["risk_tier"], s2["last_visit_date"]) == ("일반", pd.Timestamp("2025-03-01"))
+    assert s2["name"] == "박영희" and s2["pin"] == "0034"
+
+def _race(db, name, upload, write):
+    # 업로드 병합(읽기 → 전체 교체) 도중 다른 스레드가 계속 기록해도 그 기록이 사라지지 않아야 함
+    done, wrote = threading.Event(), []
+    def writer():
+        i = 0
+        while not done.is_set() or i < 20:
+            write(i); wrote.append(i); i += 1
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        ingest.ingest(db, name, io.BytesIO(upload.encode("utf-8")), chunk_rows=2_000)
+    finally:
+        done.set(); t.join()
+    storage.cache.invalidate()
+    return wrote
+
+def test_concurrent_appends_survive_ledger_update(db):
+    n = 20_000
+    ts = pd.date_range("2025-01-01", periods=n, freq="min").strftime("%Y-%m-%dT%H:%M:%S")
+    base = pd.DataFrame({"ts": ts, "senior_id": "S1", "name": "김수정", "systolic": 120}).reindex(
+        columns=list(storage.SCHEMAS["visits"]))
+    db.save("visits", storage.apply_schema(base, "visits"))
+    upload = base.assign(systolic=[130 if i % 20 == 0 else 120 for i in range(n)]).to_csv(index=False)
+    wrote = _race(db, "visits", upload, lambda i: db.append(
+        "visits", {"ts": f"2026-01-01T00:00:00.{i:06d}", "senior_id": "W", "name": "부하", "notes": str(i)}))
+    v = db.load("visits")
+    assert sorted(v.loc[v["senior_id"] == "W", "notes"].astype(int)) == wrote
+    assert (v["systolic"] == 130).sum() == n // 20 and len(v) == n + len(wrote)
+
+def test_concurrent_registrations_survive_roster_update(db):
+    upload = "senior_id,pin\n" + "".join(f"S{i},{i:04d}\n" for i in range(1, 3)) + \
+             "".join(f"N{i},1111\n" for i in range(3000))
+    wrote = _race(db, "seniors", upload, lambda i: service.add_senior(
+        db, {"senior_id": f"W{i}", "name": "부하", "pin": "2222", "risk_tier": "일반"}))
+    ids = set(db.load("seniors")["senior_id"])
+    assert {f"W{i}" for i in wrote} <= ids
+    assert {"S1", "S2", "N0", "N2999"} <= ids and _row(db, "S1")["pin"] == "0001"
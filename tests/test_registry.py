@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# 공유 명부 색인: touch/add 는 새 색인을 돌려주고 원본은 그대로(기록 실패 시 공유본이 바뀌지 않게)
+import os, sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from registry import SeniorRegistry
+
+def _reg():
+    return SeniorRegistry(storage.apply_schema(pd.DataFrame([
+        {"senior_id": "S1", "name": "김수정", "pin": "0012", "last_visit_date": "2025-01-01"},
+        {"senior_id": "S2", "name": "박영희", "pin": "0034", "last_visit_date": "2025-02-01"},
+    ]), "seniors"))
+
+def test_touch_leaves_original():
+    reg = _reg()
+    new = reg.touch("S1", "2025-05-05")
+    assert new.get("S1")["last_visit_date"] == pd.Timestamp("2025-05-05")
+    assert reg.get("S1")["last_visit_date"] == pd.Timestamp("2025-01-01")
+
+def test_add_leaves_original():
+    reg = _reg()
+    new = reg.add(storage.apply_schema(pd.DataFrame([{"senior_id": "S3", "name": "김철수"}]), "seniors"))
+    assert "S3" in new and "S3" not in reg
+    assert new.search("김") == ["S1", "S3"]
+    assert reg.search("김") == ["S1"]
+    assert len(reg.df) == 2 and len(new.df) == 3
+
+def test_blank_pin_never_matches():
+    reg = SeniorRegistry(pd.DataFrame({"senior_id": ["S1", "S2", "S3"], "name": ["a", "b", "c"],
+                                       "pin": [float("nan"), None, " "]}, dtype=object))
+    for sid in ("S1", "S2", "S3"):
+        assert not any(reg.verify_pin(sid, p) for p in ("nan", "None", "", " ", "<NA>"))
+    assert _reg().verify_pin("S1", "0012") and not _reg().verify_pin("S1", "0013")
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# 장부 저널 압축: 도중 종료(예외로 흉내)·동시 전체 교체 뒤에도 행이 빠지거나 겹치지 않아야 함
+import os, sys, shutil
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+
+class Crash(Exception):
+    pass
+
+@pytest.fixture
+def ledger(tmp_path):
+    path = str(tmp_path / "fund.csv")
+    pd.DataFrame({"ts": ["2025-01-01T09:00:00"], "type": ["in"], "amount": [1], "store": ["a"],
+                  "memo": [""], "donation_rate": [0]}).to_csv(path, index=False)
+    return path
+
+def _add(path, *amounts):
+    for a in amounts:
+        storage.append_record(path, {"ts": "2025-01-02T09:00:00", "type": "in", "amount": a, "store": "a"})
+
+def _amounts(path):
+    return sorted(storage.load_ledger(path, "fund")["amount"].tolist())
+
+def test_compact_merges_journal(ledger):
+    _add(ledger, 2, 3)
+    assert storage.compact_ledger(ledger)
+    assert not os.path.exists(storage.journal_path(ledger))
+    assert _amounts(ledger) == [1, 2, 3]
+
+def test_crash_before_swap_replays_compacting(ledger, monkeypatch):
+    _add(ledger, 2, 3)
+    monkeypatch.setattr(storage.shutil, "copyfileobj", lambda *a: (_ for _ in ()).throw(Crash()))
+    with pytest.raises(Crash):
+        storage.compact_ledger(ledger)
+    _add(ledger, 4)
+    assert _amounts(ledger) == [1, 2, 3, 4]
+    monkeypatch.undo()
+    assert storage.compact_ledger(ledger)
+    assert _amounts(ledger) == [1, 2, 3, 4]
+
+def test_crash_after_swap_does_not_duplicate(ledger, monkeypatch):
+    _add(ledger, 2, 3)
+    monkeypatch.setattr(storage, "_finish_compaction", lambda p: (_ for _ in ()).throw(Crash()))
+    with pytest.raises(Crash):
+        storage.compact_ledger(ledger)
+    monkeypatch.undo()
+    assert os.path.exists(storage._compacting_path(ledger))
+    assert _amounts(ledger) == [1, 2, 3]
+    assert not os.path.exists(storage._compacting_path(ledger))
+
+def test_stale_marker_dropped_on_next_compaction(ledger, monkeypatch):
+    # 정리 중 .compacting 만 지우고 종료 → .compacted 가 현재 스냅샷과 일치한 채 남음
+    _add(ledger, 2)
+    real = storage._finish_compaction
+    monkeypatch.setattr(storage, "_finish_compaction", lambda p: os.remove(storage._compacting_path(p)))
+    assert storage.compact_ledger(ledger)
+    monkeypatch.setattr(storage, "_finish_compaction", real)
+    assert os.path.exists(storage._marker_path(ledger))
+    # 다음 압축이 저널 이름을 바꾼 직후 종료
+    _add(ledger, 3, 4)
+    monkeypatch.setattr(storage.shutil, "copyfileobj", lambda *a: (_ for _ in ()).throw(Crash()))
+    with pytest.raises(Crash):
+        storage.compact_ledger(ledger)
+    monkeypatch.undo()
+    assert _amounts(ledger) == [1, 2, 3, 4]
+
+def test_replace_during_compaction_wins(ledger, monkeypatch):
+    _add(ledger, 2, 3)
+    new = storage.load_ledger(ledger, "fund").iloc[:1].assign(amount=9)
+    copy = shutil.copyfileobj
+    def replace_midway(src, dst):
+        storage.replace_ledger(ledger, new)
+        copy(src, dst)
+    monkeypatch.setattr(storage.shutil, "copyfileobj", replace_midway)
+    assert not storage.compact_ledger(ledger)
+    monkeypatch.undo()
+    assert _amounts(ledger) == [9]
+    assert not [f for f in os.listdir(os.path.dirname(ledger)) if f.endswith((".tmp", ".compacted"))]
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# 바이탈(혈압·체중) 분석: 어르신별 이동 평균 추이, 이상·급변 측정 표시, 차트용 점 줄이기
+#
+# 방문 기록을 (어르신, 시각) 순으로 한 번 정렬한 뒤, 어르신별 이동 창(rolling)을 누적합의 차로
+# 전체를 한꺼번에 계산합니다(어르신 단위 groupby 반복 없음). 어르신별 행은 정렬 구간(start, stop)으로 바로 잘라 쓰고, 차트는 점 수를
+# MAX_POINTS 이하로 줄여 그립니다(지역 전체: 시간 구간 평균, 개인: LTTB).
+import sys
+import numpy as np
+import pandas as pd
+import storage
+
+VITALS = ["systolic", "diastolic", "weight_kg"]
+WINDOW = 5          # 이동 평균에 쓰는 최근 측정 수
+MAX_POINTS = 500    # 차트 하나에 그리는 최대 점 수
+
+# 측정 1건 기준(mmHg)
+SYS_HIGH, DIA_HIGH = 140, 90
+SYS_LOW, DIA_LOW = 90, 60
+# 급변 기준: 직전 WINDOW 회 평균 대비
+SYS_JUMP = 20          # 수축기 mmHg
+WEIGHT_JUMP = 0.05     # 체중 비율(5%)
+
+FLAGS = {"high_bp": "고혈압", "low_bp": "저혈압", "bp_jump": "혈압 급변", "weight_jump": "체중 급변"}
+# 지역 전체 차트의 시간 단위(기간 종류, 이름, 대략 일수): 점 수가 MAX_POINTS 이하가 되는 가장 촘촘한 것
+_FREQS = [("h", "시간", 1 / 24), ("D", "일", 1), ("W", "주", 7), ("M", "월", 31), ("Q", "분기", 92), ("Y", "년", 366)]
+
+def _group_starts(codes: np.ndarray) -> np.ndarray:
+    # 같은 코드끼리 붙어 있는 배열에서 각 행이 속한 묶음의 시작 위치
+    first = np.r_[True, codes[1:] != codes[:-1]] if len(codes) else np.empty(0, bool)
+    return np.maximum.accumulate(np.where(first, np.arange(len(codes)), 0))
+
+def rolling_mean(vals: np.ndarray, starts: np.ndarray, window: int) -> np.ndarray:
+    """묶음(starts)별 최근 window 행의 평균(NaN 제외, 하나도 없으면 NaN). vals 는 (행, 열) 배열.
+    누적합의 차로 계산해 묶음 수·크기와 무관하게 배열 연산 몇 번으로 끝남."""
+    ok = ~np.isnan(vals)
+    zero = np.zeros((1, vals.shape[1]))
+    cs = np.vstack([zero, np.cumsum(np.where(ok, vals, 0), axis=0)])
+    cn = np.vstack([zero, np.cumsum(ok, axis=0)])
+    hi = np.arange(1, len(vals) + 1)
+    lo = np.maximum(hi - window, starts)
+    n = cn[hi] - cn[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (cs[hi] - cs[lo]) / n, np.nan)
+
+def analyze(visits: pd.DataFrame, window: int = WINDOW) -> pd.DataFrame:
+    """방문 기록 → (senior_id, ts) 순 측정 표: 측정값, 이동 평균(*_avg), 이상 표시(FLAGS 열).
+    0·빈 값은 측정 안 함으로 보고, 측정값이 하나도 없는 방문은 제외."""
+    df = visits.reindex(columns=["ts", "senior_id", "name"] + VITALS)
+    vit = df[VITALS].apply(pd.to_numeric, errors="coerce").astype("float64")
+    vit = vit.where(vit > 0)
+    ts = pd.to_datetime(df["ts"], errors="coerce")
+    keep = (ts.notna() & vit.notna().any(axis=1)).to_numpy()
+    codes, ids = pd.factorize(df["senior_id"].to_numpy()[keep])
+    t = ts.to_numpy()[keep].view("i8")
+    # 장부는 대개 시각 순으로 쌓이므로 그때는 어르신 코드만 안정 정렬
+    order = np.argsort(codes, kind="stable") if (np.diff(t) >= 0).all() else np.lexsort((t, codes))
+    codes = codes[order]
+
+    out = pd.DataFrame({"ts": ts.to_numpy()[keep][order],
+                        "senior_id": pd.Categorical.from_codes(codes, pd.Index(ids).astype(str)),
+                        "name": pd.Categorical(df["name"].to_numpy()[keep][order])})
+    vals = vit.to_numpy()[keep][order]
+    out[VITALS] = vals
+
+    # 어르신별 최근 window 회 평균, 직전 평균(= 한 행 앞의 평균, 묶음 첫 행은 없음)
+    starts = _group_starts(codes)
+    avg = rolling_mean(vals, starts, window)
+    prev = np.vstack([np.full((1, len(VITALS)), np.nan), avg[:-1]]) if len(avg) else avg
+    prev[starts == np.arange(len(starts))] = np.nan
+    for i, c in enumerate(VITALS):
+        out[c + "_avg"] = avg[:, i].astype("float32")
+
+    s, d, w = vals.T if len(vals) else np.empty((3, 0))
+    ps, pw = prev[:, 0], prev[:, 2]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["high_bp"] = (s >= SYS_HIGH) | (d >= DIA_HIGH)
+        out["low_bp"] = (s < SYS_LOW) | (d < DIA_LOW)
+        out["bp_jump"] = np.abs(s - ps) >= SYS_JUMP
+        out["weight_jump"] = np.abs(w - pw) / pw >= WEIGHT_JUMP
+    return out
+
+def flag_labels(df: pd.DataFrame) -> pd.Series:
+    """FLAGS 열 → "고혈압, 혈압 급변" 같은 표시용 문자열(화면에 올릴 행에만 사용)."""
+    out = pd.Series("", index=df.index)
+    for col, label in FLAGS.items():
+        out = out.where(~df[col], out + np.where(out == "", "", ", ") + label)
+    return out
+
+# -------------------- 점 줄이기 --------------------
+def lttb(x, y, n: int = MAX_POINTS) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: 봉우리·골을 살리며 n 개 점의 위치(정렬된 index) 선택.
+    반복은 구간 수(n)만큼이고, 구간 안의 계산은 배열 연산."""
+    x, y = np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)   # 처음·끝 점을 뺀 n-2 구간
+    cx, cy = np.r_[0, np.cumsum(x)], np.r_[0, np.cumsum(y)]
+    lo, hi = edges[:-1], edges[1:]
+    # 다음 구간 평균(마지막 구간의 다음은 끝 점)
+    nlo, nhi = np.r_[lo[1:], size - 1], np.r_[hi[1:], size]
+    ax, ay = (cx[nhi] - cx[nlo]) / (nhi - nlo), (cy[nhi] - cy[nlo]) / (nhi - nlo)
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        bx, by = x[lo[i]:hi[i]], y[lo[i]:hi[i]]
+        area = np.abs((x[a] - ax[i]) * (by - y[a]) - (x[a] - bx) * (ay[i] - y[a]))
+        a = keep[i + 1] = lo[i] + int(np.argmax(area))
+    return keep
+
+def downsample(df: pd.DataFrame, cols, n: int = MAX_POINTS, x: str = "ts") -> pd.DataFrame:
+    """x 순으로 정렬된 df 에서 cols 각각의 LTTB 선택점을 합친 행만 반환(열마다 n 개 이하)."""
+    if len(df) <= n:
+        return df
+    xs = df[x].to_numpy().view("i8") if x in df else np.arange(len(df))
+    pick = []
+    for c in cols:
+        ok = np.flatnonzero(df[c].notna().to_numpy())
+        pick.append(ok[lttb(xs[ok], df[c].to_numpy()[ok], n)])
+    return df.iloc[np.unique(np.concatenate(pick))] if pick else df.iloc[:0]
+
+def rollup(df: pd.DataFrame, max_points: int = MAX_POINTS):
+    """analyze() 결과 → (시간 구간별 평균·측정 수·이상 수 DataFrame, 단위 이름).
+    구간 경계를 searchsorted 로 찾고 bincount 로 합산(정렬·resample 없이 행 수에 선형)."""
+    cols = VITALS + ["readings", "flagged"]
+    if not len(df):
+        return pd.DataFrame(columns=cols, index=pd.DatetimeIndex([], name="ts")), _FREQS[0][1]
+    t = df["ts"].to_numpy().view("i8")
+    lo, hi = pd.Timestamp(t.min()), pd.Timestamp(t.max())
+    days = (hi - lo) / pd.Timedelta(days=1)
+    freq, label, _ = next((f for f in _FREQS if days / f[2] <= max_points), _FREQS[-1])
+    starts = pd.period_range(lo, hi, freq=freq).to_timestamp()
+    b = np.searchsorted(starts.asi8, t, side="right") - 1
+    out = pd.DataFrame(index=pd.DatetimeIndex(starts, name="ts"))
+    for c in VITALS:
+        v = df[c].to_numpy()
+        ok = ~np.isnan(v)
+        n = np.bincount(b[ok], minlength=len(starts))
+        with np.errstate(invalid="ignore"):
+            out[c] = np.bincount(b[ok], weights=v[ok], minlength=len(starts)) / np.where(n, n, np.nan)
+    out["readings"] = np.bincount(b, minlength=len(starts))
+    out["flagged"] = np.bincount(b, weights=df[list(FLAGS)].any(axis=1).to_numpy(), minlength=len(starts)).astype(int)
+    return out, label
+
+# -------------------- 분석 결과(프로세스 공유) --------------------
+class Vitals:
+    """방문 기록 한 버전의 분석 결과. 프로세스당 하나를 모든 세션이 읽기 전용으로 공유하므로
+    add() 는 제자리에서 바꾸지 않고 새 Vitals 를 반환."""
+    def __init__(self, visits: pd.DataFrame, window: int = WINDOW):
+        self.window = window
+        self._set(analyze(visits, window))
+
+    def _set(self, df):
+        self.df = df
+        codes = df["senior_id"].cat.codes.to_numpy()
+        starts = np.unique(_group_starts(codes))
+        stops = np.r_[starts[1:], len(codes)]
+        ids = df["senior_id"].cat.categories.astype(str)[codes[starts]]
+        self._span = dict(zip(ids, zip(starts.tolist(), stops.tolist())))
+        self._rollups = {}
+        return self
+
+    def __len__(self): return len(self.df)
+
+    @property
+    def nbytes(self):
+        return int(self.df.memory_usage(index=True, deep=True).sum()) + sys.getsizeof(self._span)
+
+    def senior(self, sid) -> pd.DataFrame:
+        """한 어르신의 측정(시각 순). 정렬 구간을 바로 잘라 명부 크기와 무관."""
+        start, stop = self._span.get(str(sid), (0, 0))
+        return self.df.iloc[start:stop]
+
+    def flagged(self) -> pd.DataFrame:
+        """이상·급변 표시가 하나라도 있는 측정."""
+        return self.df[self.df[list(FLAGS)].any(axis=1)]
+
+    def rollup(self, max_points: int = MAX_POINTS):
+        """지역 전체 추이: 점 수가 max_points 이하가 되는 가장 촘촘한 시간 단위의
+        (구간별 평균·측정 수·이상 수 DataFrame, 단위 이름). 버전마다 한 번만 계산."""
+        if max_points not in self._rollups:
+            self._rollups[max_points] = rollup(self.df, max_points)
+        return self._rollups[max_points]
+
+    def add(self, visits: pd.DataFrame) -> "Vitals":
+        """새 방문 기록을 반영한 새 Vitals. 해당 어르신의 최근 window 회 측정과 새 행만 다시 계산해
+        그 어르신 구간 끝에 끼워 넣음(체크인 1건에 전체 재계산 없음). 기존 측정보다 이른 기록이
+        섞이면 전체 재계산."""
+        fresh = visits[visits["senior_id"].notna()]
+        parts, at = [], []
+        for sid, rows in fresh.groupby(fresh["senior_id"].astype(str), sort=False):
+            tail = self.senior(sid).iloc[-self.window:]
+            if len(tail) and pd.to_datetime(rows["ts"], errors="coerce").min() < tail["ts"].iloc[-1]:
+                return Vitals(pd.concat([self.df, visits], ignore_index=True), self.window)
+            part = analyze(pd.concat([tail, rows], ignore_index=True), self.window).iloc[len(tail):]
+            parts.append(part)
+            at += [self._span.get(sid, (len(self.df),) * 2)[1]] * len(part)
+        if not at:
+            return self
+        new = pd.concat(parts, ignore_index=True)
+        df = storage.concat_rows(self.df, new)
+        order = np.insert(np.arange(len(self.df)), at, np.arange(len(self.df), len(df)))
+        out = object.__new__(Vitals)
+        out.window = self.window
+        return out._set(df.take(order).reset_index(drop=True))